@@ -1,9 +1,17 @@
 from spellchecker import SpellChecker
 from typing import List, Tuple
+from collections import OrderedDict
 
 class AutoCorrector: # Inizializzo il sistema di autocorrezione usando SpellChecker con il dizionario italiano
         
-    def __init__(self):
+    def __init__(self, cache_size=1024):
+        # Cache LRU delle analisi per parola, condivisa tra le frasi: generare le modifiche a distanza 2 è costoso
+        self.cache_size = cache_size
+        self._analyses = OrderedDict()  # parola -> (correzione, confidenza, candidati)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_invalidations = 0
+
         try:
             self.spell = SpellChecker(language='it')
             
@@ -42,31 +50,47 @@ class AutoCorrector: # Inizializzo il sistema di autocorrezione usando SpellChec
             raise
 
     def find_closest_word(self, word: str) -> Tuple[str, float]:
+        correction, confidence, _ = self.analyze_word(word)
+        return correction, confidence
+
+    def analyze_word(self, word: str) -> Tuple[str, float, Tuple[str, ...]]: # Correzione, confidenza e candidati, dalla cache se possibile
+        analysis = self._analyses.get(word)
+        if analysis is not None:
+            self._analyses.move_to_end(word)
+            self.cache_hits += 1
+            return analysis
+
+        self.cache_misses += 1
+        analysis = self._analyze(word)
+        self._analyses[word] = analysis
+        if len(self._analyses) > self.cache_size:
+            self._analyses.popitem(last=False)
+        return analysis
+
+    def _analyze(self, word: str) -> Tuple[str, float, Tuple[str, ...]]:
 
         # Se la parola è vuota o è uno spazio la ritorno com'è
         if not word or word.isspace():
-            return word, 1.0
+            return word, 1.0, ()
 
         # Se la parola è già corretta non c'è bisogno che la modifico ulteriormente
         if self.spell.known([word]):
-            return word, 1.0
+            return word, 1.0, ()
 
-        # Trova la correzione migliore
-        correction = self.spell.correction(word)
-        
-        if correction is None or correction == word:
-            return word, 0.0
+        # I candidati vengono generati una volta sola; la correzione è il più frequente, come in spell.correction
+        candidates = self.spell.candidates(word)
+        if not candidates:
+            return word, 0.0, ()
+        correction = max(sorted(candidates), key=lambda candidate: self.spell[candidate])
+
+        if correction == word:
+            return word, 0.0, ()
 
         # Calcolo un punteggio di confidenza basato sulla dimensione dell'insieme di candidati, più è piccolo l'insieme più sono confidente della correzione
-        candidates = self.spell.candidates(word)
-        if candidates:
-           
-            confidence = 1.0 / len(candidates)   
-            confidence = 0.5 + (confidence * 0.5) # Normalizziamo il punteggio tra 0.5 e 1.0
-        else:
-            confidence = 0.0
+        confidence = 1.0 / len(candidates)
+        confidence = 0.5 + (confidence * 0.5) # Normalizziamo il punteggio tra 0.5 e 1.0
 
-        return correction, confidence
+        return correction, confidence, tuple(candidates)
 
     def correct_phrase(self, phrase: str) -> Tuple[str, List[Tuple[str, str, float]], dict]: #correzione in caso di frase totalmente sbagliata
 
@@ -84,7 +108,7 @@ class AutoCorrector: # Inizializzo il sistema di autocorrezione usando SpellChec
                 corrected_words.append(word)
                 continue
                 
-            corrected_word, confidence = self.find_closest_word(word)
+            corrected_word, confidence, candidates = self.analyze_word(word)
             
             # Preserva il formato originale (maiuscolo/minuscolo)
             if word.isupper():
@@ -97,7 +121,7 @@ class AutoCorrector: # Inizializzo il sistema di autocorrezione usando SpellChec
             # Salva le correzioni effettuate e i candidati
             if word.lower() != corrected_word.lower():
                 corrections.append((word, corrected_word, confidence))
-                all_candidates[word] = list(self.spell.candidates(word))
+                all_candidates[word] = list(candidates)
         
         return ' '.join(corrected_words), corrections, all_candidates
 
@@ -105,6 +129,19 @@ class AutoCorrector: # Inizializzo il sistema di autocorrezione usando SpellChec
     def add_words(self, words: List[str]): # aggiunta di parole nuove nel dizionario
         for word in words:
             self.spell.word_frequency.add(word)
+        if words:  # Una parola nuova può diventare candidata di qualunque parola già analizzata
+            self._analyses.clear()
+            self.cache_invalidations += 1
+
+    def stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': self.cache_hits / lookups if lookups else 0.0,
+            'size': len(self._analyses),
+            'invalidations': self.cache_invalidations,
+        }
 
     def cleanup(self):
         try:
@@ -112,6 +149,7 @@ class AutoCorrector: # Inizializzo il sistema di autocorrezione usando SpellChec
             self.spell.word_frequency.dictionary = {}
             
             # Rimozione delle referenze
+            self._analyses.clear()
             self.spell = None
             self.phonetic_rules = None
             self.common_errors = None
@@ -119,5 +157,19 @@ class AutoCorrector: # Inizializzo il sistema di autocorrezione usando SpellChec
         except Exception as e:
             print(f"Errore durante il cleanup dell'AutoCorrector: {e}")
 
+class NullAutoCorrector: # Stessa interfaccia di AutoCorrector senza dizionario: le frasi restano come sono
+
+    def correct_phrase(self, phrase: str) -> Tuple[str, List[Tuple[str, str, float]], dict]:
+        return phrase, [], {}
+
+    def add_words(self, words: List[str]):
+        pass
+
+    def stats(self):
+        return {}
+
+    def cleanup(self):
+        pass
+
 def create_autocorrector() -> AutoCorrector: #creazione dell'istanza di autocorrector
     return AutoCorrector()
\ No newline at end of file
@@ -0,0 +1,174 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import cv2
+
+from landmark_geometry import QUANTIZATION_STEP, RECOGNITION_CACHE_SIZE
+from smoothing import SMOOTHING_CHOICES, create_filters
+from spelling_session import SpellingSession
+
+# Trascrizione senza interfaccia di video registrati o cartelle di immagini: stessa logica di lettere, spazi,
+# reset e autocorrezione del tracker, con i tempi presi dal video invece che da time.time()
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+DEFAULT_FPS = 30.0
+
+_worker = {}  # Stato per processo: opzioni e autocorrettore, caricato una volta sola dall'initializer
+
+
+def iter_video_frames(path): # (frame BGR, istante in secondi) dal numero di frame e dagli fps dichiarati dal file
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    index = 0
+    try:
+        while True:
+            success, frame = capture.read()
+            if not success:
+                break
+            yield frame, index / fps
+            index += 1
+    finally:
+        capture.release()
+
+
+def iter_image_frames(directory, fps=DEFAULT_FPS): # Immagini in ordine di nome, una ogni 1/fps secondi
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+    for index, name in enumerate(names):
+        frame = cv2.imread(os.path.join(directory, name))
+        if frame is not None:
+            yield frame, index / fps
+
+
+def iter_frames(path, fps=DEFAULT_FPS):
+    if os.path.isdir(path):
+        return iter_image_frames(path, fps)
+    return iter_video_frames(path)
+
+
+def find_inputs(paths): # Espande le cartelle che contengono video; una cartella di sole immagini è un'unica registrazione
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(VIDEO_EXTENSIONS))
+            inputs.extend(videos or [path])
+        else:
+            inputs.append(path)
+    return inputs
+
+
+def _init_worker(options):
+    _worker.clear()
+    _worker.update(options)
+    if options['autocorrect']:
+        from autocorrection import create_autocorrector
+        _worker['autocorrector'] = create_autocorrector()
+
+
+def _create_recognizer():
+    if _worker['engine'] == 'prototypes':
+        from prototype_classifier import PrototypeClassifier
+        return PrototypeClassifier.load(_worker['prototypes'])
+    from landmark_geometry import LetterRecognizer
+    return LetterRecognizer()
+
+
+def transcribe(path): # Elabora un file e restituisce la lista dei suoi eventi
+    import mediapipe as mp
+    from pipeline import mirror_results
+
+    # Un'istanza di Hands e una sessione nuove per ogni file: il tracking non deve continuare tra registrazioni diverse
+    hands = mp.solutions.hands.Hands(static_image_mode=False, max_num_hands=2,
+                                     min_detection_confidence=_worker['min_detection_confidence'])
+    landmark_filter, label_filter = create_filters(_worker['smoothing'], _worker['hysteresis'])
+    session = SpellingSession(_create_recognizer(), _worker.get('autocorrector'),
+                              landmark_filter=landmark_filter, label_filter=label_filter,
+                              quantization_step=_worker['quantization_step'],
+                              recognition_cache_size=_worker['recognition_cache_size'])
+    events = []
+    frames = 0
+    timestamp = 0.0
+
+    try:
+        for frame, timestamp in iter_frames(path, _worker['fps']):
+            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if _worker['mirror']:
+                mirror_results(results)
+            events.extend(session.step(results.multi_hand_landmarks, timestamp))
+            frames += 1
+
+        # A fine registrazione è come se le mani uscissero dall'inquadratura: la parola in corso diventa la frase
+        events.extend(session.step([], timestamp))
+    finally:
+        hands.close()
+
+    events.append({'type': 'end', 'time': timestamp, 'frames': frames, 'metrics': session.metrics()})
+    for event in events:
+        event['file'] = path
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trascrizione LIS senza interfaccia di video o cartelle di immagini")
+    parser.add_argument('inputs', nargs='+', help="file video, cartelle di video o cartelle di immagini")
+    parser.add_argument('-o', '--output', help="file JSONL degli eventi (default: standard output)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="processi in parallelo")
+    parser.add_argument('--fps', type=float, default=DEFAULT_FPS, help="fps delle cartelle di immagini")
+    parser.add_argument('--engine', choices=['rules', 'prototypes'], default='rules')
+    parser.add_argument('--prototypes', default='prototypes.npz')
+    parser.add_argument('--no-mirror', dest='mirror', action='store_false',
+                        help="i video sono già specchiati (di default sono frame grezzi della camera, come nel tracker)")
+    parser.add_argument('--no-autocorrect', dest='autocorrect', action='store_false')
+    parser.add_argument('--min-detection-confidence', type=float, default=0.7)
+    parser.add_argument('--smoothing', choices=SMOOTHING_CHOICES, default='none')
+    parser.add_argument('--hysteresis', type=int, default=0)
+    parser.add_argument('--quantization-step', type=float, default=QUANTIZATION_STEP,
+                        help="passo di quantizzazione dei landmark nella cache del riconoscimento")
+    parser.add_argument('--recognition-cache-size', type=int, default=RECOGNITION_CACHE_SIZE,
+                        help="voci nella cache del riconoscimento (0: disattivata)")
+    args = parser.parse_args()
+
+    inputs = find_inputs(args.inputs)
+    options = {
+        'engine': args.engine,
+        'prototypes': args.prototypes,
+        'fps': args.fps,
+        'mirror': args.mirror,
+        'autocorrect': args.autocorrect,
+        'min_detection_confidence': args.min_detection_confidence,
+        'smoothing': args.smoothing,
+        'hysteresis': args.hysteresis,
+        'quantization_step': args.quantization_step,
+        'recognition_cache_size': args.recognition_cache_size,
+    }
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        jobs = max(1, min(args.jobs or 1, len(inputs)))
+        if jobs == 1:
+            _init_worker(options)
+            _write_events(inputs, map(transcribe, inputs), output)
+        else:
+            # imap restituisce i file nell'ordine di ingresso: l'output è identico a ogni esecuzione
+            with multiprocessing.get_context('spawn').Pool(jobs, initializer=_init_worker, initargs=(options,)) as pool:
+                _write_events(inputs, pool.imap(transcribe, inputs), output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def _write_events(inputs, transcripts, output):
+    for path, events in zip(inputs, transcripts):
+        for event in events:
+            output.write(json.dumps(event, ensure_ascii=False) + '\n')
+        output.flush()
+        phrases = [event['corrected'] for event in events if event['type'] == 'phrase']
+        print(f"{path}: {' | '.join(phrases) or '-'}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
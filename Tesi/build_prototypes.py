@@ -0,0 +1,98 @@
+import argparse
+import os
+
+import numpy as np
+
+from prototype_classifier import DEFAULT_ASPECT_RATIO, normalize_landmarks
+
+# Costruisce l'indice dei prototipi per PrototypeClassifier a partire da landmark registrati.
+# Formati accettati:
+#   - cartelle <radice>/<LETTERA>/*.npy con array (N, 21, 3) o (21, 3) di esempi di quella lettera
+#   - file .npz con gli array 'points' (N, 21, 3) e 'labels' (N,)
+
+
+def load_recordings(paths):
+    points, labels = [], []
+
+    def add(samples, letter):
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, 21, 3)
+        points.append(samples)
+        labels.extend([letter] * len(samples))
+
+    def add_labelled(path):
+        with np.load(path) as recording:
+            for letter in np.unique(recording['labels']):
+                add(recording['points'][recording['labels'] == letter], str(letter))
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith('.npy'):
+                        add(np.load(os.path.join(root, name)), os.path.basename(root).upper())
+                    elif name.endswith('.npz'):
+                        add_labelled(os.path.join(root, name))
+        elif path.endswith('.npz'):
+            add_labelled(path)
+        elif path.endswith('.npy'):
+            add(np.load(path), os.path.basename(os.path.dirname(os.path.abspath(path))).upper())
+
+    if not points:
+        raise ValueError("Nessun landmark registrato trovato nei percorsi indicati")
+    return np.concatenate(points), np.array(labels)
+
+
+def kmeans(samples, k, iterations=20, seed=0): # Riduce gli esempi di una lettera a k centroidi
+    if len(samples) <= k:
+        return samples
+    rng = np.random.default_rng(seed)
+    centroids = samples[rng.choice(len(samples), k, replace=False)]
+    for _ in range(iterations):
+        distances = ((samples[:, None, :] - centroids[None, :, :]) ** 2).sum(-1)
+        assignment = distances.argmin(axis=1)
+        for i in range(k):
+            members = samples[assignment == i]
+            if len(members):
+                centroids[i] = members.mean(axis=0)
+    return centroids
+
+
+def build_index(points, labels, max_per_letter=40, percentile=99.0, aspect_ratio=DEFAULT_ASPECT_RATIO):
+    vectors = normalize_landmarks(points, aspect_ratio)
+    prototypes, prototype_labels, own_distances = [], [], []
+
+    for letter in np.unique(labels):
+        samples = vectors[labels == letter]
+        centroids = kmeans(samples, max_per_letter)
+        prototypes.append(centroids)
+        prototype_labels.extend([letter] * len(centroids))
+
+        # Distanza di ogni esempio dal prototipo più vicino della sua lettera, per la soglia di rifiuto
+        distances = np.sqrt(((samples[:, None, :] - centroids[None, :, :]) ** 2).sum(-1)).min(axis=1)
+        own_distances.append(distances)
+
+    max_distance = float(np.percentile(np.concatenate(own_distances), percentile))
+    return np.concatenate(prototypes), np.array(prototype_labels), max_distance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costruisce l'indice dei prototipi dai landmark registrati")
+    parser.add_argument('paths', nargs='+', help="cartelle per lettera con file .npy, oppure file .npz con 'points' e 'labels'")
+    parser.add_argument('-o', '--output', default='prototypes.npz')
+    parser.add_argument('--max-per-letter', type=int, default=40, help="numero massimo di prototipi per lettera (k-means)")
+    parser.add_argument('--percentile', type=float, default=99.0, help="percentile delle distanze di training usato come soglia di rifiuto")
+    parser.add_argument('--aspect-ratio', type=float, default=DEFAULT_ASPECT_RATIO)
+    args = parser.parse_args()
+
+    points, labels = load_recordings(args.paths)
+    prototypes, prototype_labels, max_distance = build_index(
+        points, labels, args.max_per_letter, args.percentile, args.aspect_ratio)
+
+    np.savez(args.output, prototypes=prototypes, labels=prototype_labels,
+             max_distance=max_distance, aspect_ratio=args.aspect_ratio)
+    print(f"Indice salvato in {args.output}: {len(prototypes)} prototipi per {len(np.unique(labels))} lettere "
+          f"da {len(points)} esempi, soglia di rifiuto {max_distance:.3f}")
+
+
+if __name__ == '__main__':
+    main()
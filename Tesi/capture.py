@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+
+import cv2
+
+
+class LatestFrameCapture: # Cattura su un thread dedicato: conserva solo il frame più recente, quelli vecchi vengono scartati
+
+    def __init__(self, source=0, width=1280, height=720):
+        self.capture = cv2.VideoCapture(source)
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self._condition = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._frame_is_new = False
+        self._failed = False
+
+        self.frames_captured = 0
+        self.frames_dropped = 0  # Frame sovrascritti prima che il ciclo di inferenza li leggesse
+        self.frames_read = 0
+
+        self.is_running = True
+        self.live = True  # Istanti di cattura dall'orologio di sistema
+
+        self.capture_thread = threading.Thread(target=self._capture_loop)
+        self.capture_thread.daemon = True
+        self.capture_thread.start()  # Avvio del thread di cattura
+
+    def _capture_loop(self): # Legge dalla camera alla sua velocità, indipendentemente dall'inferenza
+        while self.is_running:
+            success, frame = self.capture.read()
+            timestamp = time.time()
+
+            with self._condition:
+                if not success:
+                    self._failed = True
+                    self._condition.notify_all()
+                    break
+
+                if self._frame_is_new:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._timestamp = timestamp
+                self._frame_is_new = True
+                self.frames_captured += 1
+                self._condition.notify_all()
+
+    def read(self, timeout=1.0): # Attende un frame non ancora letto; restituisce (successo, frame, istante di cattura)
+        with self._condition:
+            self._condition.wait_for(lambda: self._frame_is_new or self._failed or not self.is_running, timeout)
+            if not self._frame_is_new:
+                return False, None, None
+
+            self._frame_is_new = False
+            self.frames_read += 1
+            return True, self._frame, self._timestamp
+
+    def isOpened(self):
+        return self.capture.isOpened() and not self._failed
+
+    def stats(self):
+        return {
+            'captured': self.frames_captured,
+            'read': self.frames_read,
+            'dropped': self.frames_dropped,
+        }
+
+    def release(self): # Pulizia delle risorse
+        self.is_running = False
+        if self.capture_thread.is_alive():
+            self.capture_thread.join()
+        self.capture.release()
+
+
+class VideoFileCapture: # Video da file: tutti i frame in ordine, con l'istante ricavato dal numero di frame e dagli fps
+
+    def __init__(self, path, realtime=False, default_fps=30.0):
+        self.capture = cv2.VideoCapture(path)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or default_fps
+        self.realtime = realtime  # True: un frame ogni 1/fps secondi, come una camera; False: il prima possibile
+        self.live = False  # Gli istanti sono del video, non dell'orologio
+
+        self._start = None
+        self._finished = False
+        self.frames_read = 0
+
+    def read(self, timeout=1.0): # Stessa interfaccia di LatestFrameCapture.read; nessun frame viene scartato
+        if self._finished:
+            return False, None, None
+
+        timestamp = self.frames_read / self.fps
+        if self.realtime:
+            now = time.monotonic()
+            if self._start is None:
+                self._start = now
+            wait = self._start + timestamp - now
+            if timeout is not None and wait > timeout:
+                time.sleep(timeout)
+                return False, None, None
+            if wait > 0:
+                time.sleep(wait)
+
+        success, frame = self.capture.read()
+        if not success:
+            self._finished = True
+            return False, None, None
+        self.frames_read += 1
+        return True, frame, timestamp
+
+    def isOpened(self):
+        return self.capture.isOpened() and not self._finished
+
+    def stats(self):
+        return {
+            'captured': self.frames_read,
+            'read': self.frames_read,
+            'dropped': 0,
+        }
+
+    def release(self): # Pulizia delle risorse
+        self.capture.release()
+
+
+def create_capture(source=0, width=1280, height=720, realtime=False): # Factory function: camera con il thread di cattura o file video
+    if isinstance(source, str) and os.path.isfile(source):
+        return VideoFileCapture(source, realtime)
+    return LatestFrameCapture(source, width, height)
@@ -0,0 +1,81 @@
+from collections import deque
+
+import numpy as np
+
+
+class InferenceGovernor: # Abbassa la frequenza di inferenza quando mano e lettera sono ferme, la riporta al massimo al primo movimento
+
+    def __init__(self, max_interval=0.3, motion_threshold=0.05, cpu_budget=None, window=2.0):
+        self.max_interval = max_interval  # Budget di latenza: ritardo massimo con cui mi accorgo di un cambiamento
+        self.motion_threshold = motion_threshold  # Spostamento medio dei landmark, in frazioni della dimensione della mano
+        self.cpu_budget = cpu_budget  # Frazione massima del tempo passata in inferenza (None = nessun limite)
+        self.window = window  # Finestra in secondi per il calcolo degli fps effettivi
+
+        self.interval = 0.0  # Intervallo minimo tra due inferenze, 0 = ogni frame
+        self._last_inference = None
+        self._last_points = None
+        self._last_letter = None
+        self._inference_time = 0.0  # Media mobile della durata di un'inferenza
+        self._timestamps = deque()
+
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+
+    def should_infer(self, timestamp): # Decide se il frame va passato a MediaPipe o se riuso i risultati precedenti
+        if self._last_inference is None:
+            return True
+
+        interval = self.interval
+        if self.cpu_budget:
+            interval = max(interval, self._inference_time / self.cpu_budget)
+
+        if timestamp - self._last_inference >= interval:
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def observe(self, results, timestamp, duration): # Registra un'inferenza appena fatta e aggiorna l'intervallo
+        self._last_inference = timestamp
+        self._inference_time = duration if not self.frames_inferred else 0.9 * self._inference_time + 0.1 * duration
+        self.frames_inferred += 1
+        self._timestamps.append(timestamp)
+        while self._timestamps[0] < timestamp - self.window:
+            self._timestamps.popleft()
+
+        hands = results.multi_hand_landmarks or []
+        points = np.array([[(landmark.x, landmark.y) for landmark in hand.landmark] for hand in hands])
+
+        if self._last_points is None or points.shape != self._last_points.shape:
+            steady = False  # Mano comparsa, sparita o cambiato il numero di mani
+        elif not len(points):
+            steady = True  # Nessuna mano in vista da più frame
+        else:
+            extent = np.ptp(points, axis=1).max(axis=1)  # Dimensione di ogni mano
+            motion = np.abs(points - self._last_points).mean(axis=(1, 2)) / np.maximum(extent, 1e-6)
+            steady = bool(np.all(motion < self.motion_threshold))
+
+        self._last_points = points
+        if not steady:
+            self.interval = 0.0
+        else:
+            self.interval = min(self.max_interval, max(self.interval * 2.0, 0.05))
+
+    def observe_letter(self, letter): # Un cambio di lettera riporta subito l'inferenza alla frequenza piena
+        if letter != self._last_letter:
+            self._last_letter = letter
+            self.interval = 0.0
+
+    def fps(self): # Inferenze al secondo nella finestra più recente
+        if len(self._timestamps) < 2:
+            return 0.0
+        elapsed = self._timestamps[-1] - self._timestamps[0]
+        return (len(self._timestamps) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        return {
+            'inferred': self.frames_inferred,
+            'skipped': self.frames_skipped,
+            'inference_fps': round(self.fps(), 1),
+            'inference_ms': round(self._inference_time * 1000.0, 1),
+        }
+
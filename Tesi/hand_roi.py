@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+
+
+class RegionOfInterest: # Dopo aver trovato una mano l'inferenza gira su un riquadro ridotto attorno ad essa invece che sul frame intero
+
+    def __init__(self, size=256, padding=0.5, margin=0.1, full_frame_interval=15):
+        self.size = size  # Lato in pixel dell'immagine passata a MediaPipe
+        self.padding = padding  # Margine attorno alla mano, in frazioni della sua estensione
+        self.margin = margin  # Se la mano arriva a questa distanza dal bordo del riquadro lo ricentro
+        self.full_frame_interval = full_frame_interval  # Ogni tanto il frame intero, per accorgermi della seconda mano del reset
+
+        self.box = None  # (x0, y0, lato) in pixel sul frame intero
+        self._active = None  # Riquadro usato per il frame in corso, None se è il frame intero
+        self._frames_since_full = 0
+        self._crop = np.empty((size, size, 3), dtype=np.uint8)
+        self._rgb_crop = np.empty((size, size, 3), dtype=np.uint8)
+        self._rgb_full = None
+
+        self.frames_roi = 0
+        self.frames_full = 0
+
+    def prepare(self, frame, full_frame=False): # Frame BGR -> immagine RGB su cui fare l'inferenza (riquadro ridimensionato o frame intero)
+        self._frames_since_full += 1
+        if full_frame or self.box is None or self._frames_since_full >= self.full_frame_interval:
+            self._active = None
+            self._frames_since_full = 0
+            self.frames_full += 1
+            if self._rgb_full is None or self._rgb_full.shape != frame.shape:
+                self._rgb_full = np.empty_like(frame)
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_full)
+
+        x0, y0, side = self._active = self.box
+        self.frames_roi += 1
+        cv2.resize(frame[y0:y0 + side, x0:x0 + side], (self.size, self.size), dst=self._crop,
+                   interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(self._crop, cv2.COLOR_BGR2RGB, dst=self._rgb_crop)
+
+    def update(self, results, frame_shape): # Riporta i landmark nelle coordinate del frame intero e aggiorna il riquadro
+        height, width = frame_shape[:2]
+        hands = results.multi_hand_landmarks or []
+
+        if self._active is not None:
+            x0, y0, side = self._active
+            for hand in hands:
+                for landmark in hand.landmark:
+                    landmark.x = (x0 + landmark.x * side) / width
+                    landmark.y = (y0 + landmark.y * side) / height
+                    landmark.z = landmark.z * side / width  # z di MediaPipe è in scala con la larghezza dell'immagine
+
+        if len(hands) != 1:  # Mano persa o due mani (gesto di reset): si torna al frame intero
+            self.box = None
+            return results
+
+        xs = np.array([landmark.x for landmark in hands[0].landmark]) * width
+        ys = np.array([landmark.y for landmark in hands[0].landmark]) * height
+        left, right, top, bottom = xs.min(), xs.max(), ys.min(), ys.max()
+
+        if self.box is not None:  # Finché la mano resta dentro il riquadro non lo sposto, così il tracking di MediaPipe resta coerente
+            x0, y0, side = self.box
+            inset = side * self.margin
+            if (left >= x0 + inset and right <= x0 + side - inset
+                    and top >= y0 + inset and bottom <= y0 + side - inset):
+                return results
+
+        extent = max(right - left, bottom - top)
+        side = int(min(max(extent * (1.0 + 2.0 * self.padding), self.size / 4), width, height))
+        x0 = int(np.clip((left + right - side) / 2, 0, width - side))
+        y0 = int(np.clip((top + bottom - side) / 2, 0, height - side))
+        self.box = (x0, y0, side)
+        return results
+
+    def reset(self):
+        self.box = None
+
+    def stats(self):
+        return {
+            'roi_frames': self.frames_roi,
+            'full_frames': self.frames_full,
+        }
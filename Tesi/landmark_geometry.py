@@ -1,651 +1,639 @@
+import functools
+import math
+import operator
+from collections import Counter, OrderedDict
+
 import numpy as np
-import mediapipe as mp
-
-mp_hands = mp.solutions.hands
-
-# Definizione dei landmark delle dita
-WRIST = mp_hands.HandLandmark.WRIST
-THUMB_TIP = mp_hands.HandLandmark.THUMB_TIP
-THUMB_MCP = mp_hands.HandLandmark.THUMB_MCP
-THUMB_IP = mp_hands.HandLandmark.THUMB_IP
-INDEX_FINGER_MCP = mp_hands.HandLandmark.INDEX_FINGER_MCP
-INDEX_FINGER_PIP = mp_hands.HandLandmark.INDEX_FINGER_PIP
-INDEX_FINGER_TIP = mp_hands.HandLandmark.INDEX_FINGER_TIP
-MIDDLE_FINGER_MCP = mp_hands.HandLandmark.MIDDLE_FINGER_MCP
-MIDDLE_FINGER_PIP = mp_hands.HandLandmark.MIDDLE_FINGER_PIP
-MIDDLE_FINGER_TIP = mp_hands.HandLandmark.MIDDLE_FINGER_TIP
-RING_FINGER_MCP = mp_hands.HandLandmark.RING_FINGER_MCP
-RING_FINGER_PIP = mp_hands.HandLandmark.RING_FINGER_PIP
-RING_FINGER_TIP = mp_hands.HandLandmark.RING_FINGER_TIP
-PINKY_MCP = mp_hands.HandLandmark.PINKY_MCP
-PINKY_PIP = mp_hands.HandLandmark.PINKY_PIP
-PINKY_TIP = mp_hands.HandLandmark.PINKY_TIP
-
-def get_distance(p1, p2):
-    return np.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2)
-
-def get_angle(p1, p2, p3):
-    v1 = np.array([p1.x - p2.x, p1.y - p2.y])
-    v2 = np.array([p3.x - p2.x, p3.y - p2.y])
-    return np.abs(np.math.atan2(np.linalg.det([v1,v2]),np.dot(v1,v2)))
-
-def finger_is_closed(landmarks, finger_tip, finger_mcp):
-    return get_distance(landmarks[finger_tip], landmarks[WRIST]) < get_distance(landmarks[finger_mcp], landmarks[WRIST])
-
-def finger_is_straight(landmarks, finger_mcp, finger_pip, finger_tip):
-    angle = get_angle(landmarks[finger_mcp], landmarks[finger_pip], landmarks[finger_tip])
+
+from rule_engine import compile_rules, evaluate_term
+
+# Definizione dei landmark delle dita: stessi indici di mp.solutions.hands.HandLandmark,
+# scritti qui per non dover importare mediapipe (lento) solo per il riconoscimento
+WRIST = 0
+THUMB_TIP = 4
+THUMB_CMC = 1
+THUMB_MCP = 2
+THUMB_IP = 3
+INDEX_FINGER_MCP = 5
+INDEX_FINGER_PIP = 6
+INDEX_FINGER_DIP = 7
+INDEX_FINGER_TIP = 8
+MIDDLE_FINGER_MCP = 9
+MIDDLE_FINGER_PIP = 10
+MIDDLE_FINGER_DIP = 11
+MIDDLE_FINGER_TIP = 12
+RING_FINGER_MCP = 13
+RING_FINGER_PIP = 14
+RING_FINGER_DIP = 15
+RING_FINGER_TIP = 16
+PINKY_MCP = 17
+PINKY_PIP = 18
+PINKY_DIP = 19
+PINKY_TIP = 20
+
+NUM_LANDMARKS = 21
+
+# Catena dei landmark di ogni dito, dalla base alla punta
+FINGER_CHAINS = [
+    (WRIST, THUMB_CMC, THUMB_MCP, THUMB_IP, THUMB_TIP),
+    (WRIST, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_DIP, INDEX_FINGER_TIP),
+    (WRIST, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_DIP, MIDDLE_FINGER_TIP),
+    (WRIST, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_DIP, RING_FINGER_TIP),
+    (WRIST, PINKY_MCP, PINKY_PIP, PINKY_DIP, PINKY_TIP),
+]
+
+# I 15 angoli articolari (3 per dito) come terne (p1, vertice, p3).
+# Per le quattro dita l'angolo della PIP è misurato verso la punta, come nei predicati
+ANGLE_TRIPLES = []
+for base, j1, j2, j3, tip in FINGER_CHAINS:
+    if j1 == THUMB_CMC:
+        ANGLE_TRIPLES += [(base, j1, j2), (j1, j2, j3), (j2, j3, tip)]
+    else:
+        ANGLE_TRIPLES += [(base, j1, j2), (j1, j2, tip), (j2, j3, tip)]
+
+ANGLE_INDEX = {triple: i for i, triple in enumerate(ANGLE_TRIPLES)}
+_ANGLE_P1, _ANGLE_VERTEX, _ANGLE_P3 = (np.array(column) for column in zip(*ANGLE_TRIPLES))
+
+
+def landmarks_to_array(landmarks): # Converte i 21 landmark di MediaPipe in un array (21, 3)
+    if isinstance(landmarks, np.ndarray):
+        return landmarks.reshape(NUM_LANDMARKS, 3)
+    if isinstance(landmarks, dict):
+        landmarks = [landmarks[l] for l in range(NUM_LANDMARKS)]
+    return np.array([(l.x, l.y, l.z) for l in landmarks], dtype=np.float64)
+
+
+def _pairwise_distances(xy): # Tutte le distanze a coppie (nel piano x, y): (..., 21, 2) -> (..., 21, 21)
+    diff = xy[..., :, None, :] - xy[..., None, :, :]
+    return np.sqrt(np.einsum('...ijk,...ijk->...ij', diff, diff))
+
+
+def _joint_angles(xy): # I 15 angoli articolari in forma vettoriale: (..., 21, 2) -> (..., 15)
+    v1 = xy[..., _ANGLE_P1, :] - xy[..., _ANGLE_VERTEX, :]
+    v2 = xy[..., _ANGLE_P3, :] - xy[..., _ANGLE_VERTEX, :]
+    cross = v1[..., 0] * v2[..., 1] - v1[..., 1] * v2[..., 0]
+    dot = np.einsum('...k,...k->...', v1, v2)
+    return np.abs(np.arctan2(cross, dot))
+
+
+class HandFeatures: # Distanze e angoli di un frame calcolati solo quando un predicato li chiede, e una volta sola
+
+    def __init__(self, points):
+        self.points = landmarks_to_array(points)
+
+        # Liste Python per avere accessi scalari veloci dai predicati
+        self.x = self.points[:, 0].tolist()
+        self.y = self.points[:, 1].tolist()
+        self._distances = {}
+        self._angles = {}
+
+    def distance(self, p1, p2): # Stesse operazioni di _pairwise_distances, così singolo frame e batch coincidono
+        key = (p1, p2) if p1 < p2 else (p2, p1)
+        distance = self._distances.get(key)
+        if distance is None:
+            dx = self.x[p1] - self.x[p2]
+            dy = self.y[p1] - self.y[p2]
+            distance = self._distances[key] = math.sqrt(dx * dx + dy * dy)
+        return distance
+
+    def angle(self, p1, p2, p3):
+        key = (p1, p2, p3)
+        angle = self._angles.get(key)
+        if angle is None:
+            x, y = self.x, self.y
+            v1x, v1y = x[p1] - x[p2], y[p1] - y[p2]
+            v2x, v2y = x[p3] - x[p2], y[p3] - y[p2]
+            angle = self._angles[key] = abs(math.atan2(v1x * v2y - v1y * v2x, v1x * v2x + v1y * v2y))
+        return angle
+
+
+class BatchHandFeatures(HandFeatures): # Le stesse feature per N frame: ogni accesso restituisce un array di N valori
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 3)
+        xy = self.points[:, :, :2]
+
+        # Il frame è l'ultimo asse, così x[THUMB_TIP] o dist[a][b] sono vettori di lunghezza N
+        self.x = np.ascontiguousarray(self.points[:, :, 0].T)
+        self.y = np.ascontiguousarray(self.points[:, :, 1].T)
+        self.dist = np.ascontiguousarray(_pairwise_distances(xy).transpose(1, 2, 0))
+        self.angles = np.ascontiguousarray(_joint_angles(xy).T)
+
+    def distance(self, p1, p2):
+        return self.dist[p1][p2]
+
+    def angle(self, p1, p2, p3):
+        return self.angles[ANGLE_INDEX[(p1, p2, p3)]]
+
+    def __len__(self):
+        return self.points.shape[0]
+
+
+def extract_hand_features(landmarks):
+    if isinstance(landmarks, HandFeatures):
+        return landmarks
+    return HandFeatures(landmarks)
+
+
+# Le primitive combinano le condizioni con & e queste funzioni al posto di and/all/max/min,
+# così lo stesso codice vale sia per un singolo frame (bool) sia per un batch (maschere numpy)
+def _all(conditions):
+    return functools.reduce(operator.and_, conditions)
+
+def _between(low, value, high):
+    return (low < value) & (value < high)
+
+def _spread(values): # Differenza tra il valore massimo e il minimo
+    return functools.reduce(np.maximum, values) - functools.reduce(np.minimum, values)
+
+
+# Primitive usate dalle regole delle lettere: ricevono le feature e gli indici dei landmark
+
+def finger_is_closed(features, finger_tip, finger_mcp):
+    return features.distance(finger_tip, WRIST) < features.distance(finger_mcp, WRIST)
+
+def finger_is_extended(features, finger_tip, finger_mcp):
+    return features.distance(finger_tip, WRIST) > features.distance(finger_mcp, WRIST)
+
+def finger_is_straight(features, finger_mcp, finger_pip, finger_tip):
+    angle = features.angle(finger_mcp, finger_pip, finger_tip)
     return angle > 2.8  # Circa 160 gradi
 
-def finger_is_curled(landmarks, finger_mcp, finger_pip, finger_tip):
-    angle = get_angle(landmarks[finger_mcp], landmarks[finger_pip], landmarks[finger_tip])
+def finger_is_curled(features, finger_mcp, finger_pip, finger_tip):
+    angle = features.angle(finger_mcp, finger_pip, finger_tip)
     return angle < 1.5  # Circa 90 gradi
 
-def fingers_are_close(landmarks, fingers):
-    distances = [get_distance(landmarks[fingers[i]], landmarks[fingers[i+1]]) for i in range(len(fingers)-1)]
-    return all(d < 0.1 for d in distances)
-
-def is_A(landmarks):
-    fingers_closed = all(finger_is_closed(landmarks, tip, mcp) for tip, mcp in [
-        (INDEX_FINGER_TIP, INDEX_FINGER_MCP),
-        (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-        (RING_FINGER_TIP, RING_FINGER_MCP),
-        (PINKY_TIP, PINKY_MCP)
-    ])
-    thumb_folded = get_distance(landmarks[THUMB_TIP], landmarks[INDEX_FINGER_MCP]) < 0.1
-    
-    return (fingers_closed and thumb_folded)
-
-def is_B(landmarks):
-    thumb_tip = landmarks[THUMB_TIP]
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    middle_tip = landmarks[MIDDLE_FINGER_TIP]
-    ring_tip = landmarks[RING_FINGER_TIP]
-    pinky_tip = landmarks[PINKY_TIP]
-    wrist = landmarks[WRIST]
-
-    fingers_straight = all(finger_is_straight(landmarks, mcp, pip, tip) for mcp, pip, tip in [
-        (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP),
-        (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-        (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-        (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    ])
-    fingers_close = (get_distance(index_tip, pinky_tip) < 0.15)
-    thumb_lower = (thumb_tip.y > index_tip.y)
-    fingers_up = all(tip.y < wrist.y for tip in [index_tip, middle_tip, ring_tip, pinky_tip])
-    thumb_not_folded = get_distance(thumb_tip, wrist) > get_distance(landmarks[THUMB_MCP], wrist)
-    
-    thumb_bent = get_distance(thumb_tip, landmarks[INDEX_FINGER_MCP]) < 0.1
-
-    return (fingers_straight and fingers_close and thumb_lower and 
-            fingers_up and thumb_not_folded and thumb_bent)
-
-def is_C(landmarks):
-    thumb_tip = landmarks[THUMB_TIP]
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    middle_tip = landmarks[MIDDLE_FINGER_TIP]
-    ring_tip = landmarks[RING_FINGER_TIP]
-    pinky_tip = landmarks[PINKY_TIP]
-    
-    
-    thumb_index_distance = get_distance(thumb_tip, index_tip)
-     
-    fingers_curved = all(0.8 < get_angle(landmarks[mcp], landmarks[pip], landmarks[tip]) < 2.5
-                         for mcp, pip, tip in [
-                             (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP),
-                             (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-                             (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-                             (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-                         ])
-    
-   
-    thumb_position = landmarks[THUMB_TIP].x < landmarks[INDEX_FINGER_MCP].x
-    
-    
-    finger_tips_y = [index_tip.y, middle_tip.y, ring_tip.y, pinky_tip.y]
-    max_y_diff = max(finger_tips_y) - min(finger_tips_y)
-    fingers_aligned = max_y_diff < 0.05  
-    
-    
-    finger_tips_x = [index_tip.x, middle_tip.x, ring_tip.x, pinky_tip.x]
-    max_x_diff = max(finger_tips_x) - min(finger_tips_x)
-    fingers_grouped = max_x_diff < 0.1  
-    
-    
-    thumb_index_condition = 0.08 < thumb_index_distance < 0.25
-    
-    return (thumb_index_condition and fingers_curved and thumb_position and fingers_aligned and fingers_grouped)
-
-def is_D(landmarks):
-    index_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    other_fingers_touch_thumb = all(get_distance(landmarks[THUMB_TIP], landmarks[tip]) < 0.1 for tip in [
-        MIDDLE_FINGER_TIP, RING_FINGER_TIP, PINKY_TIP
-    ])
-    return index_straight and other_fingers_touch_thumb 
-
-def is_E(landmarks):
-    all_fingers_curled = all(finger_is_curled(landmarks, mcp, pip, tip) for mcp, pip, tip in [
-        (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP),
-        (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-        (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-        (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    ])
-
-    thumb_not_horizontal = abs(landmarks[THUMB_TIP].y - landmarks[THUMB_MCP].y) > 0.07
-    
-    thumb_folded = get_distance(landmarks[THUMB_TIP], landmarks[INDEX_FINGER_MCP]) < 0.12
-    return ( all_fingers_curled and thumb_folded and thumb_not_horizontal )
-
-def is_F(landmarks):
-    thumb_tip = landmarks[THUMB_TIP]
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    middle_tip = landmarks[MIDDLE_FINGER_TIP]
-    
-    
-    thumb_index_touch = get_distance(thumb_tip, index_tip) < 0.05
-    
-    
-    other_fingers_straight = all(finger_is_straight(landmarks, mcp, pip, tip) 
-                                 for mcp, pip, tip in [
-                                     (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-                                     (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-                                     (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-                                 ])
-    
-    
-    index_middle_distance = get_distance(index_tip, middle_tip) > 0.1
-    
-    return (thumb_index_touch and other_fingers_straight and index_middle_distance)
-
-def is_G(landmarks):
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    
-    index_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP) 
-    
-    
-    thumb_on_middle = get_distance(landmarks[THUMB_TIP], landmarks[MIDDLE_FINGER_TIP]) < 0.1
-    
-    middle_curled = finger_is_curled(landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-    ring_curled = finger_is_curled(landmarks, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-    pinky_curled = finger_is_curled(landmarks, PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    
-    index_horizontal = (abs(index_tip.y - landmarks[INDEX_FINGER_MCP].y) < 0.1 and 
-                       abs(index_tip.x - landmarks[INDEX_FINGER_MCP].x) > 0.12)
-
-    return (index_straight and thumb_on_middle and middle_curled and ring_curled and pinky_curled and index_horizontal)
-
-def is_H(landmarks):
-    
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    middle_tip = landmarks[MIDDLE_FINGER_TIP]
-    
-    index_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    middle_straight = finger_is_straight(landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-    
-    fingers_straight = (get_distance(index_tip, middle_tip) < 0.1)
-    
-    other_fingers_curled = all(finger_is_curled(landmarks, mcp, pip, tip) for mcp, pip, tip in [
-        (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-        (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    ])
-    
-    index_horizontal = (abs(index_tip.y - landmarks[INDEX_FINGER_MCP].y) < 0.1 and 
-                       abs(index_tip.x - landmarks[INDEX_FINGER_MCP].x) > 0.15)
-    
-    middle_horizontal = (abs(middle_tip.y - landmarks[MIDDLE_FINGER_MCP].y) < 0.1 and
-                        abs(middle_tip.x - landmarks[MIDDLE_FINGER_MCP].x) > 0.15)
-    
-    return (index_straight and middle_straight and 
-            other_fingers_curled and fingers_straight and
-            index_horizontal and middle_horizontal)
-
-def is_I(landmarks):
-    
-    pinky_straight = finger_is_straight(landmarks, PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    pinky_pointing_up = landmarks[PINKY_TIP].y < landmarks[PINKY_MCP].y
-    
-
-    thumb_touches_index = get_distance(landmarks[THUMB_TIP], landmarks[INDEX_FINGER_PIP]) < 0.08
-    
-   
-    other_fingers_curled = all(
-        finger_is_curled(landmarks, mcp, pip, tip) for mcp, pip, tip in [
-            (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP),
-            (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-            (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-        ]
-    )
-    
-   
-    fingers_closed = all(
-        landmarks[tip].y > landmarks[mcp].y for tip, mcp in [
-            (INDEX_FINGER_TIP, INDEX_FINGER_MCP),
-            (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-            (RING_FINGER_TIP, RING_FINGER_MCP)
-        ]
-    )
-    
-    
-    pinky_higher = all(
-        landmarks[PINKY_TIP].y < landmarks[tip].y - 0.1 for tip in [
-            INDEX_FINGER_TIP,
-            MIDDLE_FINGER_TIP,
-            RING_FINGER_TIP
-        ]
-    )
-
-    return (pinky_straight and pinky_pointing_up and thumb_touches_index and other_fingers_curled and fingers_closed and pinky_higher)
-
-def is_J(landmarks):
-   
-    pinky_straight = finger_is_straight(landmarks, PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    
-   
-    pinky_horizontal_and_low = (landmarks[PINKY_TIP].y > landmarks[THUMB_TIP].y and
-                                abs(landmarks[PINKY_TIP].x - landmarks[PINKY_MCP].x) > 0.1)
-    
-   
-    thumb_on_top = (landmarks[THUMB_TIP].y < landmarks[INDEX_FINGER_TIP].y and
-                    abs(landmarks[THUMB_TIP].x - landmarks[INDEX_FINGER_MCP].x) < 0.1)
-
-    middle_curled = finger_is_curled(landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-    ring_curled = finger_is_curled(landmarks, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-    index_curled = finger_is_curled(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-
-    return (pinky_straight and pinky_horizontal_and_low and thumb_on_top and 
-            middle_curled and ring_curled and index_curled)
-
-def is_K(landmarks):
-   
-    thumb_straight = finger_is_straight(landmarks, THUMB_MCP, THUMB_IP, THUMB_TIP)
-    index_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    middle_straight = finger_is_straight(landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-
-   
-    index_higher_than_middle = landmarks[INDEX_FINGER_TIP].y < landmarks[MIDDLE_FINGER_TIP].y
-
-    
-    ring_curled = finger_is_curled(landmarks, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-    pinky_curled = finger_is_curled(landmarks, PINKY_MCP, PINKY_PIP, PINKY_TIP)
-
-    fingers_not_down = (landmarks[INDEX_FINGER_TIP].y < landmarks[INDEX_FINGER_MCP].y and
-                       landmarks[MIDDLE_FINGER_TIP].y < landmarks[MIDDLE_FINGER_MCP].y)
-
-    return (thumb_straight and index_straight and middle_straight and
-            index_higher_than_middle and ring_curled and pinky_curled and
-            fingers_not_down)
-
-def is_L(landmarks):
-    
-    index_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    
-    thumb_horizontal = (
-        abs(landmarks[THUMB_TIP].y - landmarks[THUMB_MCP].y) < 0.12 and  
-        landmarks[THUMB_TIP].x < landmarks[INDEX_FINGER_MCP].x and  
-        landmarks[THUMB_TIP].y > landmarks[INDEX_FINGER_MCP].y  
-    )
-    
-   
-    middle_closed = get_distance(landmarks[MIDDLE_FINGER_TIP], landmarks[MIDDLE_FINGER_MCP]) < 0.2
-    ring_closed = get_distance(landmarks[RING_FINGER_TIP], landmarks[RING_FINGER_MCP]) < 0.2
-    pinky_closed = get_distance(landmarks[PINKY_TIP], landmarks[PINKY_MCP]) < 0.2
-    
-   
-    return (
-        thumb_horizontal and index_straight and middle_closed and ring_closed and pinky_closed 
-    )
-
-def is_M(landmarks):
-    
-    fingers_straight = all(finger_is_straight(landmarks, mcp, pip, tip) for mcp, pip, tip in [
-        (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP),
-        (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-        (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-        (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    ])
-    
-    fingers_down = all(
-        landmarks[tip].y > landmarks[mcp].y + 0.05  
-        for tip, mcp in [
-            (INDEX_FINGER_TIP, INDEX_FINGER_MCP),
-            (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-            (RING_FINGER_TIP, RING_FINGER_MCP),
-            (PINKY_TIP, PINKY_MCP)
-        ]
-    )
-    
-    thumb_folded = (
-        landmarks[THUMB_TIP].x < landmarks[THUMB_IP].x and
-        landmarks[THUMB_IP].x < landmarks[THUMB_MCP].x and
-        landmarks[THUMB_TIP].x < landmarks[INDEX_FINGER_MCP].x
-    )
-    
-    # dita separate tra di loro
-    tips = [INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, RING_FINGER_TIP, PINKY_TIP]
-    fingers_spread = all(
-        get_distance(landmarks[tips[i]], landmarks[tips[i+1]]) < 0.15
-        for i in range(3)
-    )
-    
-    return (fingers_straight and fingers_down and thumb_folded and 
-            fingers_spread )
-
-def is_N(landmarks):
-    
-    fingers_straight = all(finger_is_straight(landmarks, mcp, pip, tip) for mcp, pip, tip in [
-        (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP),
-        (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-    ])
-    
-    
-    fingers_down = all(
-        landmarks[tip].y > landmarks[mcp].y + 0.05  # Devono essere significativamente più in basso
-        for tip, mcp in [
-            (INDEX_FINGER_TIP, INDEX_FINGER_MCP),
-            (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-        ]
-    )
-    
-    thumb_folded = (
-        landmarks[THUMB_TIP].x < landmarks[THUMB_IP].x and
-        landmarks[THUMB_IP].x < landmarks[THUMB_MCP].x and
-        landmarks[THUMB_TIP].x < landmarks[INDEX_FINGER_MCP].x
-    )
-    
-
-    other_fingers_curled = all(finger_is_curled(landmarks, mcp, pip, tip) for mcp, pip, tip in [
-        (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-        (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-    ])
-    
-    return (fingers_straight and fingers_down and thumb_folded and other_fingers_curled)
-
-def is_O(landmarks):
-    thumb_tip = landmarks[THUMB_TIP]
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    middle_tip = landmarks[MIDDLE_FINGER_TIP]
-    ring_tip = landmarks[RING_FINGER_TIP]
-    pinky_tip = landmarks[PINKY_TIP]
-    
-    
-    fingers_curved = all(0.3 < get_angle(landmarks[mcp], landmarks[pip], landmarks[tip]) < 2.8 
-                         for mcp, pip, tip in [
-                             (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP),
-                             (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP),
-                             (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP),
-                             (PINKY_MCP, PINKY_PIP, PINKY_TIP)
-                         ])
-    
-   
-    thumb_position = landmarks[THUMB_TIP].x < landmarks[INDEX_FINGER_PIP].x
-    
-  
-    finger_tips_y = [index_tip.y, middle_tip.y, ring_tip.y, pinky_tip.y]
-    max_y_diff = max(finger_tips_y) - min(finger_tips_y)
-    fingers_aligned = max_y_diff < 0.08  
-    
-    finger_tips_x = [index_tip.x, middle_tip.x, ring_tip.x, pinky_tip.x]
-    max_x_diff = max(finger_tips_x) - min(finger_tips_x)
-    fingers_grouped = max_x_diff < 0.15  
-    
-    
-    fingers_close_to_thumb = all(get_distance(thumb_tip, finger_tip) < 0.1 for finger_tip in [index_tip, middle_tip, ring_tip, pinky_tip])
-    
-    
-    fingers_touch_thumb = sum(get_distance(thumb_tip, finger_tip) < 0.05 for finger_tip in [index_tip, middle_tip, ring_tip, pinky_tip]) >= 2
-    
-    not_fully_closed = all(get_distance(landmarks[tip], landmarks[mcp]) > 0.05 for tip, mcp in [
-        (INDEX_FINGER_TIP, INDEX_FINGER_MCP),
-        (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-        (RING_FINGER_TIP, RING_FINGER_MCP),
-        (PINKY_TIP, PINKY_MCP)
-    ])
-
-    return (fingers_curved and thumb_position and fingers_aligned and 
-            fingers_grouped and fingers_close_to_thumb and fingers_touch_thumb and 
-            not_fully_closed)
-
-def is_P(landmarks):
-
-    index_straight = get_distance(landmarks[INDEX_FINGER_TIP], landmarks[INDEX_FINGER_PIP]) > 0.05
-    index_horizontal = abs(landmarks[INDEX_FINGER_TIP].y - landmarks[INDEX_FINGER_MCP].y) < 0.18  # Tolleranza per la posizione
-    
-    middle_straight = get_distance(landmarks[MIDDLE_FINGER_TIP], landmarks[MIDDLE_FINGER_PIP]) > 0.05
-    middle_pointing_down = landmarks[MIDDLE_FINGER_TIP].y > landmarks[MIDDLE_FINGER_MCP].y
-    
-    thumb_touching_middle = get_distance(landmarks[THUMB_TIP], landmarks[MIDDLE_FINGER_TIP]) < 0.05
-    
-    ring_curled = get_distance(landmarks[RING_FINGER_TIP], landmarks[RING_FINGER_MCP]) < 0.13
-    pinky_curled = get_distance(landmarks[PINKY_TIP], landmarks[PINKY_MCP]) < 0.13
-    
-    return (index_straight and index_horizontal and middle_straight and middle_pointing_down and thumb_touching_middle and ring_curled and pinky_curled)
-
-def is_Q(landmarks):
-
-    index_slightly_bent = (
-        get_angle(
-            landmarks[INDEX_FINGER_MCP], 
-            landmarks[INDEX_FINGER_PIP], 
-            landmarks[INDEX_FINGER_TIP]
-        ) < 2.5  # Angolo più permissivo per consentire una leggera piegatura
-    )
-    
-    index_pointing_down = landmarks[INDEX_FINGER_TIP].y > landmarks[INDEX_FINGER_MCP].y
-    
-   
-    thumb_straight_down = (
-        finger_is_straight(landmarks, THUMB_MCP, THUMB_IP, THUMB_TIP) and
-        landmarks[THUMB_TIP].y > landmarks[THUMB_MCP].y
-    )
-    
-    
-    other_fingers_curled_down = all(
-        landmarks[tip].y > landmarks[mcp].y and
-        get_distance(landmarks[tip], landmarks[mcp]) < 0.3
-        for tip, mcp in [
-            (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-            (RING_FINGER_TIP, RING_FINGER_MCP),
-            (PINKY_TIP, PINKY_MCP)
-        ]
-    )
-    
-    return (index_slightly_bent and index_pointing_down and thumb_straight_down and other_fingers_curled_down)
-
-def is_R(landmarks):
-   
-    index_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    
-    middle_straight = finger_is_straight(landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-    
-    index_middle_crossed = get_distance(landmarks[INDEX_FINGER_TIP], landmarks[MIDDLE_FINGER_TIP]) < 0.04
-
-    ring_curled = finger_is_curled(landmarks, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-    pinky_curled = finger_is_curled(landmarks, PINKY_MCP, PINKY_PIP, PINKY_TIP)
-
-    
-    index_middle_tolerance = abs(landmarks[INDEX_FINGER_TIP].x - landmarks[MIDDLE_FINGER_TIP].x) < 0.05
-
-    return (index_straight and middle_straight and index_middle_crossed and 
-            ring_curled and pinky_curled and index_middle_tolerance)
-
-def is_S(landmarks):
-    
-    thumb_horizontal = (
-        abs(landmarks[THUMB_TIP].y - landmarks[THUMB_MCP].y) < 0.1 and  
-        landmarks[THUMB_TIP].x < landmarks[INDEX_FINGER_MCP].x and  
-        landmarks[THUMB_TIP].y > landmarks[INDEX_FINGER_MCP].y  
-    )
-
-    
-    fingers_closed = all(finger_is_closed(landmarks, tip, mcp) for tip, mcp in [
-        (INDEX_FINGER_TIP, INDEX_FINGER_MCP),
-        (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-        (RING_FINGER_TIP, RING_FINGER_MCP),
-        (PINKY_TIP, PINKY_MCP)
-    ])
-
-    return thumb_horizontal and fingers_closed
-
-def is_T(landmarks):
-
-    thumb_straight_threshold = 0.1  # Imposta una soglia per la tolleranza
-    thumb_length = get_distance(landmarks[THUMB_MCP], landmarks[THUMB_TIP])
-    
-  
-    thumb_is_straight = abs(get_distance(landmarks[THUMB_IP], landmarks[THUMB_TIP]) - thumb_length) < thumb_straight_threshold
-
-    index_is_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-
-    index_is_horizontal = abs(landmarks[INDEX_FINGER_TIP].y - landmarks[INDEX_FINGER_MCP].y) < 0.15 and (
-        landmarks[INDEX_FINGER_TIP].x < landmarks[INDEX_FINGER_MCP].x
-    )
-
-    fingers_closed = all(finger_is_closed(landmarks, tip, mcp) for tip, mcp in [
-        (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-        (RING_FINGER_TIP, RING_FINGER_MCP),
-        (PINKY_TIP, PINKY_MCP)
-    ])
-
-    return (thumb_is_straight and index_is_straight and index_is_horizontal and fingers_closed)
-
-def is_U(landmarks):
-    
-    index_straight = finger_is_straight(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    middle_straight = finger_is_straight(landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-
-    
-    ring_closed = finger_is_curled(landmarks, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-    thumb_on_ring = get_distance(landmarks[THUMB_TIP], landmarks[RING_FINGER_MCP]) < 0.1
-    
-    
-    index_middle_tolerance = get_distance(landmarks[INDEX_FINGER_TIP], landmarks[MIDDLE_FINGER_TIP]) < 0.05
-
-    return index_straight and middle_straight and ring_closed and thumb_on_ring and index_middle_tolerance
-
-def is_V(landmarks): 
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    middle_tip = landmarks[MIDDLE_FINGER_TIP]
-
-    index_straight = finger_is_straight (landmarks , INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    middle_straight = finger_is_straight (landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-    ring_curled = finger_is_curled (landmarks, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-
-    thumb_on_ring = get_distance(landmarks[THUMB_TIP], landmarks[RING_FINGER_MCP]) < 0.1
-
-    fingers_spread = 0.1 < get_distance(index_tip, middle_tip) < 0.9
-
-    return (index_straight and middle_straight  and thumb_on_ring and fingers_spread and ring_curled)
-
-def is_W(landmarks): 
-
-    index_tip = landmarks[INDEX_FINGER_TIP]
-    middle_tip = landmarks[MIDDLE_FINGER_TIP]
-    ring_tip = landmarks[RING_FINGER_TIP]
-
-    index_straight = finger_is_straight (landmarks , INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-    middle_straight = finger_is_straight (landmarks, MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
-    ring_straight = finger_is_straight(landmarks, RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
-    
-    thumb_on_pinky = get_distance(landmarks[THUMB_TIP], landmarks[PINKY_MCP]) < 0.1
-
-    fingers_straight = (get_distance(index_tip, middle_tip) > 0.09)
-    fingers_straight_ring= (get_distance(middle_tip, ring_tip) > 0.07)
-    
-    return (index_straight and middle_straight and ring_straight and thumb_on_pinky and fingers_straight and fingers_straight_ring)
-
-def is_X(landmarks):
-    
-    index_curved = finger_is_curled(landmarks, INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
-
-    other_fingers_closed = all(finger_is_closed(landmarks, tip, mcp) for tip, mcp in [
-        (MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
-        (RING_FINGER_TIP, RING_FINGER_MCP),
-        (PINKY_TIP, PINKY_MCP)
-    ])
-
-    index_height_threshold = 0.13
-    index_height = landmarks[INDEX_FINGER_TIP].y - landmarks[INDEX_FINGER_MCP].y  # Altezza dell'indice
-    index_is_at_correct_height = abs(index_height) < index_height_threshold 
-
-    thumb_touch_middle = get_distance(landmarks[THUMB_TIP], landmarks[MIDDLE_FINGER_TIP]) < 0.1
-
-    return index_curved and other_fingers_closed and thumb_touch_middle and index_is_at_correct_height
-
-def is_Y(landmarks):
-   
-    thumb_extended = get_distance(landmarks[THUMB_TIP], landmarks[THUMB_MCP]) > 0.05
-    pinky_extended = get_distance(landmarks[PINKY_TIP], landmarks[PINKY_PIP]) > 0.05
-    
-   
-    index_curled = get_distance(landmarks[INDEX_FINGER_TIP], landmarks[INDEX_FINGER_MCP]) < 0.1
-    middle_curled = get_distance(landmarks[MIDDLE_FINGER_TIP], landmarks[MIDDLE_FINGER_MCP]) < 0.1
-    ring_curled = get_distance(landmarks[RING_FINGER_TIP], landmarks[RING_FINGER_MCP]) < 0.1
-    
- 
-    thumb_up = landmarks[THUMB_TIP].y < landmarks[THUMB_IP].y
-    pinky_up = landmarks[PINKY_TIP].y < landmarks[PINKY_PIP].y
-    
-  
-    thumb_pinky_spread = get_distance(landmarks[THUMB_TIP], landmarks[PINKY_TIP]) > 0.2
-    
-   
-    thumb_correct_position = (landmarks[THUMB_TIP].x > landmarks[INDEX_FINGER_MCP].x)
-    
-    return (thumb_extended and pinky_extended and 
-            index_curled and middle_curled and ring_curled and
-            thumb_up and pinky_up and 
-            thumb_pinky_spread and thumb_correct_position)
+def finger_angle_between(features, finger_mcp, finger_pip, finger_tip, low, high):
+    return _between(low, features.angle(finger_mcp, finger_pip, finger_tip), high)
+
+def finger_angle_below(features, finger_mcp, finger_pip, finger_tip, threshold):
+    return features.angle(finger_mcp, finger_pip, finger_tip) < threshold
+
+def fingers_are_close(features, fingers, threshold=0.1):
+    distances = [features.distance(fingers[i], fingers[i+1]) for i in range(len(fingers)-1)]
+    return _all(d < threshold for d in distances)
+
+def distance_below(features, p1, p2, threshold):
+    return features.distance(p1, p2) < threshold
+
+def distance_above(features, p1, p2, threshold):
+    return features.distance(p1, p2) > threshold
+
+def distance_between(features, p1, p2, low, high):
+    return _between(low, features.distance(p1, p2), high)
+
+def lengths_similar(features, p1, p2, p3, p4, threshold): # |d(p1, p2) - d(p3, p4)| sotto soglia
+    return abs(features.distance(p1, p2) - features.distance(p3, p4)) < threshold
+
+def is_above(features, p1, p2, margin=0.0): # p1 sta più in alto di p2 (la y cresce verso il basso)
+    return features.y[p1] < features.y[p2] - margin
+
+def is_below(features, p1, p2, margin=0.0):
+    return features.y[p1] > features.y[p2] + margin
+
+def is_left_of(features, p1, p2):
+    return features.x[p1] < features.x[p2]
+
+def dx_below(features, p1, p2, threshold):
+    return abs(features.x[p1] - features.x[p2]) < threshold
+
+def dx_above(features, p1, p2, threshold):
+    return abs(features.x[p1] - features.x[p2]) > threshold
+
+def dy_below(features, p1, p2, threshold):
+    return abs(features.y[p1] - features.y[p2]) < threshold
+
+def dy_above(features, p1, p2, threshold):
+    return abs(features.y[p1] - features.y[p2]) > threshold
+
+def spread_x_below(features, points, threshold):
+    return _spread([features.x[p] for p in points]) < threshold
+
+def spread_y_below(features, points, threshold):
+    return _spread([features.y[p] for p in points]) < threshold
+
+def touch_count_at_least(features, p1, points, threshold, count): # Almeno count punti a distanza < threshold da p1
+    return sum(features.distance(p1, p) < threshold for p in points) >= count
+
+
+# Terne (mcp, pip, tip) per gli angoli delle dita e coppie (tip, mcp) per le distanze dal polso
+THUMB = (THUMB_MCP, THUMB_IP, THUMB_TIP)
+INDEX = (INDEX_FINGER_MCP, INDEX_FINGER_PIP, INDEX_FINGER_TIP)
+MIDDLE = (MIDDLE_FINGER_MCP, MIDDLE_FINGER_PIP, MIDDLE_FINGER_TIP)
+RING = (RING_FINGER_MCP, RING_FINGER_PIP, RING_FINGER_TIP)
+PINKY = (PINKY_MCP, PINKY_PIP, PINKY_TIP)
+FINGERS = (INDEX, MIDDLE, RING, PINKY)
+FINGER_TIPS = (INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, RING_FINGER_TIP, PINKY_TIP)
+
+def _tip_mcp(finger):
+    return (finger[2], finger[0])
+
+# Pollice piegato verso il palmo (M, N)
+THUMB_FOLDED = [
+    (is_left_of, THUMB_TIP, THUMB_IP),
+    (is_left_of, THUMB_IP, THUMB_MCP),
+    (is_left_of, THUMB_TIP, INDEX_FINGER_MCP),
+]
+
+# Così controllo e inserisco lo spazio
+HAND_OPEN_RULE = (
+    [(is_above, tip, mcp, 0.1) for mcp, _, tip in FINGERS] +
+    [(dx_above, FINGER_TIPS[i], FINGER_TIPS[i+1], 0.04) for i in range(len(FINGER_TIPS)-1)] +
+    [(is_above, THUMB_TIP, THUMB_MCP)]
+)
+
+# Regole delle lettere: ogni lettera è la congiunzione dei suoi termini (primitiva, *argomenti).
+# L'ordine del dizionario è la priorità: vince la prima lettera la cui regola è soddisfatta.
+# Per aggiungere una lettera basta aggiungere una voce alla tabella.
+LETTER_RULES = {
+    'A': [(finger_is_closed, *_tip_mcp(f)) for f in FINGERS] + [
+        (distance_below, THUMB_TIP, INDEX_FINGER_MCP, 0.1),
+    ],
+    'B': [(finger_is_straight, *f) for f in FINGERS] + [
+        (distance_below, INDEX_FINGER_TIP, PINKY_TIP, 0.15),
+        (is_below, THUMB_TIP, INDEX_FINGER_TIP),
+    ] + [(is_above, tip, WRIST) for tip in FINGER_TIPS] + [
+        (finger_is_extended, THUMB_TIP, THUMB_MCP),
+        (distance_below, THUMB_TIP, INDEX_FINGER_MCP, 0.1),
+    ],
+    'C': [
+        (distance_between, THUMB_TIP, INDEX_FINGER_TIP, 0.08, 0.25),
+    ] + [(finger_angle_between, *f, 0.8, 2.5) for f in FINGERS] + [
+        (is_left_of, THUMB_TIP, INDEX_FINGER_MCP),
+        (spread_y_below, FINGER_TIPS, 0.05),
+        (spread_x_below, FINGER_TIPS, 0.1),
+    ],
+    'D': [
+        (finger_is_straight, *INDEX),
+    ] + [(distance_below, THUMB_TIP, tip, 0.1) for tip in (MIDDLE_FINGER_TIP, RING_FINGER_TIP, PINKY_TIP)],
+    'E': [(finger_is_curled, *f) for f in FINGERS] + [
+        (dy_above, THUMB_TIP, THUMB_MCP, 0.07),
+        (distance_below, THUMB_TIP, INDEX_FINGER_MCP, 0.12),
+    ],
+    'F': [
+        (distance_below, THUMB_TIP, INDEX_FINGER_TIP, 0.05),
+    ] + [(finger_is_straight, *f) for f in (MIDDLE, RING, PINKY)] + [
+        (distance_above, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, 0.1),
+    ],
+    'G': [
+        (finger_is_straight, *INDEX),
+        (distance_below, THUMB_TIP, MIDDLE_FINGER_TIP, 0.1),
+    ] + [(finger_is_curled, *f) for f in (MIDDLE, RING, PINKY)] + [
+        (dy_below, INDEX_FINGER_TIP, INDEX_FINGER_MCP, 0.1),
+        (dx_above, INDEX_FINGER_TIP, INDEX_FINGER_MCP, 0.12),
+    ],
+    'H': [
+        (finger_is_straight, *INDEX),
+        (finger_is_straight, *MIDDLE),
+        (distance_below, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, 0.1),
+        (finger_is_curled, *RING),
+        (finger_is_curled, *PINKY),
+        (dy_below, INDEX_FINGER_TIP, INDEX_FINGER_MCP, 0.1),
+        (dx_above, INDEX_FINGER_TIP, INDEX_FINGER_MCP, 0.15),
+        (dy_below, MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP, 0.1),
+        (dx_above, MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP, 0.15),
+    ],
+    'I': [
+        (finger_is_straight, *PINKY),
+        (is_above, PINKY_TIP, PINKY_MCP),
+        (distance_below, THUMB_TIP, INDEX_FINGER_PIP, 0.08),
+    ] + [(finger_is_curled, *f) for f in (INDEX, MIDDLE, RING)] +
+        [(is_below, *_tip_mcp(f)) for f in (INDEX, MIDDLE, RING)] +
+        [(is_above, PINKY_TIP, tip, 0.1) for tip in (INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, RING_FINGER_TIP)],
+    'J': [
+        (finger_is_straight, *PINKY),
+        (is_below, PINKY_TIP, THUMB_TIP),
+        (dx_above, PINKY_TIP, PINKY_MCP, 0.1),
+        (is_above, THUMB_TIP, INDEX_FINGER_TIP),
+        (dx_below, THUMB_TIP, INDEX_FINGER_MCP, 0.1),
+    ] + [(finger_is_curled, *f) for f in (MIDDLE, RING, INDEX)],
+    'K': [
+        (finger_is_straight, *THUMB),
+        (finger_is_straight, *INDEX),
+        (finger_is_straight, *MIDDLE),
+        (is_above, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP),
+        (finger_is_curled, *RING),
+        (finger_is_curled, *PINKY),
+        (is_above, INDEX_FINGER_TIP, INDEX_FINGER_MCP),
+        (is_above, MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
+    ],
+    'L': [
+        (finger_is_straight, *INDEX),
+        (dy_below, THUMB_TIP, THUMB_MCP, 0.12),
+        (is_left_of, THUMB_TIP, INDEX_FINGER_MCP),
+        (is_below, THUMB_TIP, INDEX_FINGER_MCP),
+    ] + [(distance_below, *_tip_mcp(f), 0.2) for f in (MIDDLE, RING, PINKY)],
+    'M': [(finger_is_straight, *f) for f in FINGERS] +
+        [(is_below, *_tip_mcp(f), 0.05) for f in FINGERS] +
+        THUMB_FOLDED + [
+        (fingers_are_close, FINGER_TIPS, 0.15),  # dita separate tra di loro
+    ],
+    'N': [(finger_is_straight, *f) for f in (INDEX, MIDDLE)] +
+        [(is_below, *_tip_mcp(f), 0.05) for f in (INDEX, MIDDLE)] +  # Devono essere significativamente più in basso
+        THUMB_FOLDED +
+        [(finger_is_curled, *f) for f in (RING, PINKY)],
+    'O': [(finger_angle_between, *f, 0.3, 2.8) for f in FINGERS] + [
+        (is_left_of, THUMB_TIP, INDEX_FINGER_PIP),
+        (spread_y_below, FINGER_TIPS, 0.08),
+        (spread_x_below, FINGER_TIPS, 0.15),
+    ] + [(distance_below, THUMB_TIP, tip, 0.1) for tip in FINGER_TIPS] + [
+        (touch_count_at_least, THUMB_TIP, FINGER_TIPS, 0.05, 2),
+    ] + [(distance_above, *_tip_mcp(f), 0.05) for f in FINGERS],
+    'P': [
+        (distance_above, INDEX_FINGER_TIP, INDEX_FINGER_PIP, 0.05),
+        (dy_below, INDEX_FINGER_TIP, INDEX_FINGER_MCP, 0.18),  # Tolleranza per la posizione
+        (distance_above, MIDDLE_FINGER_TIP, MIDDLE_FINGER_PIP, 0.05),
+        (is_below, MIDDLE_FINGER_TIP, MIDDLE_FINGER_MCP),
+        (distance_below, THUMB_TIP, MIDDLE_FINGER_TIP, 0.05),
+        (distance_below, RING_FINGER_TIP, RING_FINGER_MCP, 0.13),
+        (distance_below, PINKY_TIP, PINKY_MCP, 0.13),
+    ],
+    'Q': [
+        (finger_angle_below, *INDEX, 2.5),  # Angolo più permissivo per consentire una leggera piegatura
+        (is_below, INDEX_FINGER_TIP, INDEX_FINGER_MCP),
+        (finger_is_straight, *THUMB),
+        (is_below, THUMB_TIP, THUMB_MCP),
+    ] + [(is_below, *_tip_mcp(f)) for f in (MIDDLE, RING, PINKY)] +
+        [(distance_below, *_tip_mcp(f), 0.3) for f in (MIDDLE, RING, PINKY)],
+    'R': [
+        (finger_is_straight, *INDEX),
+        (finger_is_straight, *MIDDLE),
+        (distance_below, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, 0.04),
+        (finger_is_curled, *RING),
+        (finger_is_curled, *PINKY),
+        (dx_below, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, 0.05),
+    ],
+    'S': [
+        (dy_below, THUMB_TIP, THUMB_MCP, 0.1),
+        (is_left_of, THUMB_TIP, INDEX_FINGER_MCP),
+        (is_below, THUMB_TIP, INDEX_FINGER_MCP),
+    ] + [(finger_is_closed, *_tip_mcp(f)) for f in FINGERS],
+    'T': [
+        (lengths_similar, THUMB_IP, THUMB_TIP, THUMB_MCP, THUMB_TIP, 0.1),
+        (finger_is_straight, *INDEX),
+        (dy_below, INDEX_FINGER_TIP, INDEX_FINGER_MCP, 0.15),
+        (is_left_of, INDEX_FINGER_TIP, INDEX_FINGER_MCP),
+    ] + [(finger_is_closed, *_tip_mcp(f)) for f in (MIDDLE, RING, PINKY)],
+    'U': [
+        (finger_is_straight, *INDEX),
+        (finger_is_straight, *MIDDLE),
+        (finger_is_curled, *RING),
+        (distance_below, THUMB_TIP, RING_FINGER_MCP, 0.1),
+        (distance_below, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, 0.05),
+    ],
+    'V': [
+        (finger_is_straight, *INDEX),
+        (finger_is_straight, *MIDDLE),
+        (finger_is_curled, *RING),
+        (distance_below, THUMB_TIP, RING_FINGER_MCP, 0.1),
+        (distance_between, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, 0.1, 0.9),
+    ],
+    'W': [(finger_is_straight, *f) for f in (INDEX, MIDDLE, RING)] + [
+        (distance_below, THUMB_TIP, PINKY_MCP, 0.1),
+        (distance_above, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, 0.09),
+        (distance_above, MIDDLE_FINGER_TIP, RING_FINGER_TIP, 0.07),
+    ],
+    'X': [
+        (finger_is_curled, *INDEX),
+    ] + [(finger_is_closed, *_tip_mcp(f)) for f in (MIDDLE, RING, PINKY)] + [
+        (dy_below, INDEX_FINGER_TIP, INDEX_FINGER_MCP, 0.13),  # Altezza dell'indice
+        (distance_below, THUMB_TIP, MIDDLE_FINGER_TIP, 0.1),
+    ],
+    'Y': [
+        (distance_above, THUMB_TIP, THUMB_MCP, 0.05),
+        (distance_above, PINKY_TIP, PINKY_PIP, 0.05),
+    ] + [(distance_below, *_tip_mcp(f), 0.1) for f in (INDEX, MIDDLE, RING)] + [
+        (is_above, THUMB_TIP, THUMB_IP),
+        (is_above, PINKY_TIP, PINKY_PIP),
+        (distance_above, THUMB_TIP, PINKY_TIP, 0.2),
+        (is_left_of, INDEX_FINGER_MCP, THUMB_TIP),
+    ],
+}
+
+# Le regole vengono compilate una volta sola all'import
+LETTER_ENGINE = compile_rules(LETTER_RULES)
+
+
+def rule_holds(rule, features): # Congiunzione dei termini di una regola, valida anche su un batch
+    features = extract_hand_features(features)
+    return _all(evaluate_term(term, features) for term in rule)
+
+def is_hand_open(features):
+    return rule_holds(HAND_OPEN_RULE, features)
+
+def is_letter(letter, features):
+    return LETTER_ENGINE.matches(letter, extract_hand_features(features))
 
 def recognize_letter(landmarks):
-    
-    if is_A(landmarks):
-        return 'A'
-    elif is_B(landmarks):
-        return 'B'
-    elif is_C(landmarks):
-        return 'C'
-    elif is_D(landmarks):
-        return 'D'
-    elif is_E(landmarks):
-        return 'E'
-    elif is_F(landmarks):
-        return 'F'
-    elif is_G(landmarks):
-        return 'G'
-    elif is_H(landmarks):
-        return 'H'
-    elif is_I(landmarks):
-        return 'I'
-    elif is_J(landmarks):
-        return 'J'
-    elif is_K(landmarks):
-        return 'K'
-    elif is_L(landmarks):
-        return 'L'
-    elif is_M(landmarks):
-        return 'M'
-    elif is_N(landmarks):
-        return 'N'
-    elif is_O(landmarks):
-        return 'O'
-    elif is_P(landmarks):
-        return 'P'
-    elif is_Q(landmarks):
-        return 'Q'
-    elif is_R(landmarks):
-        return 'R'
-    elif is_S(landmarks):
-        return 'S'
-    elif is_T(landmarks):
-        return 'T'
-    elif is_U(landmarks):
-        return 'U'
-    elif is_V(landmarks):
-        return 'V'
-    elif is_W(landmarks):
-        return 'W'
-    elif is_X(landmarks):
-        return 'X'
-    elif is_Y(landmarks):
-        return 'Y'
-    else:
-        return ''
\ No newline at end of file
+    # Estraggo le feature una volta sola e percorro l'albero di decisione compilato
+    return LETTER_ENGINE.classify(extract_hand_features(landmarks))
+
+
+# Vincoli dei termini su grandezze scalari, per capire quali lettere non possono essere vere nello stesso frame.
+# Ogni vincolo è (grandezza, minimo, massimo) con estremi esclusi; un termine senza vincoli noti non esclude nulla.
+INF = float('inf')
+
+def _signed(kind, p1, p2, low, high): # Differenze con segno: la coppia va in ordine crescente, invertendo l'intervallo
+    return (kind, p1, p2, low, high) if p1 < p2 else (kind, p2, p1, -high, -low)
+
+def _pair(kind, p1, p2, low, high): # Grandezze simmetriche (distanze, valori assoluti)
+    return (kind, min(p1, p2), max(p1, p2), low, high)
+
+TERM_CONSTRAINTS = {
+    finger_is_closed: lambda tip, mcp: [_signed('dd', tip, mcp, -INF, 0.0)],  # d(tip, polso) - d(mcp, polso)
+    finger_is_extended: lambda tip, mcp: [_signed('dd', tip, mcp, 0.0, INF)],
+    finger_is_straight: lambda m, p, t: [('angle', m, p, t, 2.8, INF)],
+    finger_is_curled: lambda m, p, t: [('angle', m, p, t, -INF, 1.5)],
+    finger_angle_between: lambda m, p, t, low, high: [('angle', m, p, t, low, high)],
+    finger_angle_below: lambda m, p, t, threshold: [('angle', m, p, t, -INF, threshold)],
+    fingers_are_close: lambda fingers, threshold=0.1: [_pair('d', fingers[i], fingers[i+1], -INF, threshold)
+                                                       for i in range(len(fingers)-1)],
+    distance_below: lambda p1, p2, threshold: [_pair('d', p1, p2, -INF, threshold)],
+    distance_above: lambda p1, p2, threshold: [_pair('d', p1, p2, threshold, INF)],
+    distance_between: lambda p1, p2, low, high: [_pair('d', p1, p2, low, high)],
+    is_above: lambda p1, p2, margin=0.0: [_signed('dy', p1, p2, -INF, -margin)],  # y[p1] - y[p2]
+    is_below: lambda p1, p2, margin=0.0: [_signed('dy', p1, p2, margin, INF)],
+    is_left_of: lambda p1, p2: [_signed('dx', p1, p2, -INF, 0.0)],
+    dx_below: lambda p1, p2, threshold: [_signed('dx', p1, p2, -threshold, threshold),
+                                         _pair('|dx|', p1, p2, -INF, threshold)],
+    dx_above: lambda p1, p2, threshold: [_pair('|dx|', p1, p2, threshold, INF)],
+    dy_below: lambda p1, p2, threshold: [_signed('dy', p1, p2, -threshold, threshold),
+                                         _pair('|dy|', p1, p2, -INF, threshold)],
+    dy_above: lambda p1, p2, threshold: [_pair('|dy|', p1, p2, threshold, INF)],
+}
+
+
+def term_constraints(term):
+    constraints = TERM_CONSTRAINTS.get(term[0])
+    return constraints(*term[1:]) if constraints is not None else []
+
+
+def rules_exclusive(terms_a, terms_b): # True se le due congiunzioni vincolano una stessa grandezza a intervalli disgiunti
+    bounds = {}
+    for term in list(terms_a) + list(terms_b):
+        for *quantity, low, high in term_constraints(term):
+            quantity = tuple(quantity)
+            current_low, current_high = bounds.get(quantity, (-INF, INF))
+            low, high = max(low, current_low), min(high, current_high)
+            if low >= high:
+                return True
+            bounds[quantity] = (low, high)
+    return False
+
+
+class LetterRecognizer: # Riconoscitore con stato per una sessione: prova prima l'ultima lettera riconosciuta
+
+    stateful = False  # Il risultato è sempre quello di recognize_letter: lo stato serve solo a trovarlo prima
+    REORDER_INTERVAL = 256  # Frame tra due riordinamenti delle lettere rivali per frequenza
+
+    def __init__(self, engine=LETTER_ENGINE, rules=LETTER_RULES):
+        self.engine = engine
+        # Rivali di una lettera: le lettere più prioritarie la cui regola può essere vera nello stesso frame.
+        # Se l'ultima lettera è ancora vera basta escludere queste, non l'intero albero.
+        self.rivals = {
+            letter: [higher for higher in engine.letters[:index] if not rules_exclusive(rules[higher], rules[letter])]
+            for index, letter in enumerate(engine.letters)}
+        self._ordered_rivals = dict(self.rivals)
+        self._witnesses = {letter: {} for letter in engine.letters}  # lettera -> {rivale: termine falso l'ultima volta}
+
+        self.last_letter = ''
+        self.hits = Counter()  # Quante volte ogni lettera è stata riconosciuta nella sessione
+        self.frames = 0
+        self.cached_frames = 0  # Frame risolti dalla RecognitionCache senza passare da recognize
+        self.fast_path_hits = 0  # Frame risolti dalla regola dell'ultima lettera e dalle sue rivali
+        self.full_searches = 0  # Frame che hanno richiesto l'albero completo
+
+    def recognize(self, landmarks):
+        features = extract_hand_features(landmarks)
+        memo = self.engine.new_memo()  # I termini valutati in un passo non vengono ricalcolati nei successivi
+        letter = self.last_letter if self.last_letter and self._last_letter_wins(features, memo) else None
+        if letter is None:
+            letter = self.engine.classify(features, memo)
+            self.full_searches += 1
+        else:
+            self.fast_path_hits += 1
+
+        self.observe(letter)
+        return letter
+
+    def _last_letter_wins(self, features, memo): # La regola dell'ultima lettera è vera e nessuna rivale lo è
+        term_value = self.engine.term_value
+        letter_terms = self.engine.letter_terms
+        for term in letter_terms[self.last_letter]:
+            if not term_value(term, features, memo):
+                return False
+
+        # Per ogni rivale ricordo il termine che l'ha esclusa l'ultima volta: con la mano ferma di solito basta quello.
+        # Le rivali più frequenti nella sessione vengono provate per prime: se una è vera, decide l'albero.
+        witnesses = self._witnesses[self.last_letter]
+        for rival in self._ordered_rivals[self.last_letter]:
+            witness = witnesses.get(rival)
+            if witness is not None and not term_value(witness, features, memo):
+                continue
+            terms = letter_terms[rival]
+            witness = next((term for term in terms if memo[term] is False), None)  # Un termine già valutato falso non costa nulla
+            if witness is None:
+                witness = next((term for term in terms if not term_value(term, features, memo)), None)
+                if witness is None:
+                    return False
+            witnesses[rival] = witness
+        return True
+
+    def observe(self, letter, cached=False): # Aggiorna lo stato con una lettera riconosciuta, anche se servita dalla cache
+        self.frames += 1
+        if cached:
+            self.cached_frames += 1
+        if letter:
+            self.hits[letter] += 1
+        self.last_letter = letter
+        if self.frames % self.REORDER_INTERVAL == 0:
+            self._ordered_rivals = {candidate: sorted(rivals, key=lambda rival: -self.hits[rival])
+                                    for candidate, rivals in self.rivals.items()}
+
+    def reset(self): # Dimentica l'ultima lettera (es. dopo il reset della frase), ma non le statistiche
+        self.last_letter = ''
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        searched = max(self.frames - self.cached_frames, 1)
+        return {
+            'frames': self.frames,
+            'cached_rate': self.cached_frames / frames,
+            'fast_path_rate': self.fast_path_hits / searched,
+            'full_search_rate': self.full_searches / searched,
+            'hits': dict(self.hits),
+        }
+
+
+QUANTIZATION_STEP = 0.005  # Passo di quantizzazione predefinito della cache del riconoscimento
+RECOGNITION_CACHE_SIZE = 256
+
+
+class RecognitionCache: # Cache LRU dei risultati (lettera, mano aperta) indicizzata sui landmark quantizzati
+
+    def __init__(self, recognizer=None, quantization_step=QUANTIZATION_STEP, max_size=RECOGNITION_CACHE_SIZE):
+        self.recognizer = recognizer or LetterRecognizer()
+        # Un riconoscitore con stato non si può mettere in cache; max_size 0 disattiva la cache
+        self.enabled = max_size > 0 and not getattr(self.recognizer, 'stateful', False)
+        self._observe = getattr(self.recognizer, 'observe', None)  # Le risposte dalla cache aggiornano comunque il riconoscitore
+        self.quantization_step = quantization_step  # In coordinate normalizzate: 0.005 sono circa 6 pixel a 1280
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, points):
+        # Le regole confrontano solo differenze in x, y: uso le coordinate relative al polso e ignoro z
+        xy = points[:, :2] - points[WRIST, :2]
+        return np.round(xy / self.quantization_step).astype(np.int32).tobytes()
+
+    def recognize(self, landmarks):
+        points = landmarks_to_array(landmarks)
+        if not self.enabled:
+            return self._recognize(points)
+        key = self.key(points)
+
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self._observe is not None and not result[1]:
+                self._observe(result[0], cached=True)
+            return result
+
+        self.misses += 1
+        result = self._recognize(points)
+        self._entries[key] = result
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return result
+
+    def _recognize(self, points):
+        features = HandFeatures(points)
+        hand_open = bool(is_hand_open(features))
+        letter = '' if hand_open else self.recognizer.recognize(features)  # Con la mano aperta si inserisce lo spazio
+        return letter, hand_open
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+        }
+
+
+def recognize_letters_batch(points, chunk_size=16384): # Riconoscimento su N frame (N, 21, 3) valutando ogni termine come maschera
+    points = np.asarray(points, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 3)
+    labels = []
+
+    # Lavoro a blocchi per non allocare la matrice delle distanze di tutto il dataset in una volta
+    for start in range(0, points.shape[0], chunk_size):
+        features = BatchHandFeatures(points[start:start + chunk_size])
+        labels += LETTER_ENGINE.classify_batch(features, len(features)).tolist()
+
+    return labels
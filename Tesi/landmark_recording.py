@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from landmark_geometry import NUM_LANDMARKS, landmarks_to_array
+from smoothing import SMOOTHING_CHOICES, create_filters
+
+# Formato delle registrazioni (.lrec): intestazione di file, poi blocchi aggiunti in coda.
+# Ogni blocco è un'intestazione (magic, numero di frame) seguita da record di dimensione fissa,
+# così la lettura è una vista numpy sul file mappato in memoria, senza decodifica.
+FILE_MAGIC = b'LISREC01'
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HEADER = struct.Struct('<4sI')
+MAX_HANDS = 2
+
+HANDEDNESS_CODES = {'Left': 1, 'Right': 2}  # 0: nessuna informazione
+HANDEDNESS_LABELS = {code: label for label, code in HANDEDNESS_CODES.items()}
+
+FRAME_RECORD = np.dtype([
+    ('timestamp', '<f8'),
+    ('hands', 'u1'),
+    ('handedness', 'u1', (MAX_HANDS,)),
+    ('padding', 'u1', (5,)),
+    ('landmarks', '<f4', (MAX_HANDS, NUM_LANDMARKS, 3)),
+])
+
+
+class LandmarkRecorder: # Scrive i risultati di MediaPipe frame per frame, a blocchi, in sola aggiunta
+
+    def __init__(self, path, chunk_frames=256):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self._buffer = np.zeros(chunk_frames, dtype=FRAME_RECORD)
+        self._count = 0
+        self.frames_written = 0
+
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(FILE_MAGIC)
+
+    def write(self, timestamp, hand_landmarks_list, handedness=()): # Landmark come liste di MediaPipe o array (21, 3)
+        buffer, index = self._buffer, self._count
+        hands = (hand_landmarks_list or [])[:MAX_HANDS]
+        buffer['timestamp'][index] = timestamp
+        buffer['hands'][index] = len(hands)
+        buffer['handedness'][index] = 0
+        buffer['landmarks'][index] = 0.0
+        for i, hand in enumerate(hands):
+            buffer['landmarks'][index, i] = landmarks_to_array(hand.landmark if hasattr(hand, 'landmark') else hand)
+        for i, label in enumerate(list(handedness)[:MAX_HANDS]):
+            buffer['handedness'][index, i] = HANDEDNESS_CODES.get(label, 0)
+
+        self._count += 1
+        self.frames_written += 1
+        if self._count == self.chunk_frames:
+            self.flush()
+
+    def write_results(self, timestamp, results): # Risultati di hands.process o HandsResults
+        if hasattr(results, 'handedness'):  # HandsResults dei worker: landmark come array e lateralità come etichette
+            self.write(timestamp, list(results.landmarks), results.handedness)
+            return
+        handedness = [hand.classification[0].label for hand in getattr(results, 'multi_handedness', None) or []]
+        self.write(timestamp, results.multi_hand_landmarks, handedness)
+
+    def flush(self): # Scrive il blocco corrente; un blocco troncato da un'interruzione viene ignorato in lettura
+        if self._count:
+            self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self._count))
+            self._file.write(self._buffer[:self._count].tobytes())
+            self._file.flush()
+            self._count = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class LandmarkRecording: # Lettura di una registrazione mappata in memoria: ogni blocco è una vista, nessuna copia
+
+    def __init__(self, path):
+        self.path = path
+        self.chunks = []
+        if os.path.getsize(path) <= len(FILE_MAGIC):
+            return
+
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(data[:len(FILE_MAGIC)]) != FILE_MAGIC:
+            raise ValueError(f"{path} non è una registrazione di landmark")
+
+        offset = len(FILE_MAGIC)
+        while offset + CHUNK_HEADER.size <= len(data):
+            magic, count = CHUNK_HEADER.unpack(bytes(data[offset:offset + CHUNK_HEADER.size]))
+            if magic != CHUNK_MAGIC:
+                raise ValueError(f"{path}: blocco non valido all'offset {offset}")
+            offset += CHUNK_HEADER.size
+            available = (len(data) - offset) // FRAME_RECORD.itemsize
+            if min(count, available):
+                self.chunks.append(data[offset:offset + min(count, available) * FRAME_RECORD.itemsize].view(FRAME_RECORD))
+            if count > available:  # Ultimo blocco troncato da un'interruzione: tengo solo i frame completi
+                break
+            offset += count * FRAME_RECORD.itemsize
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def frames(self): # (istante, landmark (mani, 21, 3), lateralità) per ogni frame
+        for chunk in self.chunks:
+            for record in chunk:
+                hands = record['hands']
+                handedness = [HANDEDNESS_LABELS.get(code, '') for code in record['handedness'][:hands]]
+                yield float(record['timestamp']), record['landmarks'][:hands], handedness
+
+    def single_hand_points(self): # (N, 21, 3) dei frame con una sola mano, per il riconoscimento a batch e la taratura delle soglie
+        selected = [chunk['landmarks'][chunk['hands'] == 1, 0] for chunk in self.chunks]
+        return np.concatenate(selected) if selected else np.empty((0, NUM_LANDMARKS, 3), dtype=np.float32)
+
+
+def replay(recording, session=None): # Riproduce la logica di composizione sulla registrazione alla massima velocità
+    from spelling_session import SpellingSession
+
+    session = session or SpellingSession()
+    events = []
+    for timestamp, landmarks, _ in recording.frames():
+        events.extend(session.step(list(landmarks), timestamp))
+    return events
+
+
+def replay_letters(recording): # Lettera riconosciuta per ogni frame con una sola mano
+    from landmark_geometry import recognize_letters_batch
+    return recognize_letters_batch(recording.single_hand_points())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Riproduzione delle registrazioni di landmark")
+    parser.add_argument('recording', help="file .lrec registrato con il tracker (--record)")
+    parser.add_argument('--letters', action='store_true', help="solo il conteggio delle lettere riconosciute frame per frame")
+    parser.add_argument('--smoothing', choices=SMOOTHING_CHOICES, default='none',
+                        help="filtro sui landmark da provare sulla registrazione")
+    parser.add_argument('--hysteresis', type=int, default=0, help="frame di isteresi sull'etichetta")
+    args = parser.parse_args()
+
+    recording = LandmarkRecording(args.recording)
+    print(f"{args.recording}: {len(recording)} frame in {len(recording.chunks)} blocchi", file=sys.stderr)
+
+    if args.letters:
+        letters = replay_letters(recording)
+        counts = {letter: letters.count(letter) for letter in sorted(set(letters))}
+        print(json.dumps(counts, ensure_ascii=False))
+    else:
+        from spelling_session import SpellingSession
+        landmark_filter, label_filter = create_filters(args.smoothing, args.hysteresis)
+        session = SpellingSession(landmark_filter=landmark_filter, label_filter=label_filter)
+        for event in replay(recording, session):
+            print(json.dumps(event, ensure_ascii=False))
+        print(f"Lettere: {session.metrics()}", file=sys.stderr)  # Per confrontare i filtri sulla stessa registrazione
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class TextOverlay: # Le scritte che cambiano di rado vengono rasterizzate una volta e poi fuse sul frame con il loro canale alpha
+
+    def __init__(self, font=cv2.FONT_HERSHEY_SIMPLEX, max_layers=64):
+        self.font = font
+        self.max_layers = max_layers
+        self._layers = OrderedDict()  # (testo, scala, colore, spessore) -> (immagine premoltiplicata, 1 - alpha, linea di base)
+
+        self.layers_rendered = 0
+        self.layers_reused = 0
+
+    def _layer(self, text, scale, color, thickness):
+        key = (text, scale, color, thickness)
+        layer = self._layers.get(key)
+        if layer is not None:
+            self._layers.move_to_end(key)
+            self.layers_reused += 1
+            return layer
+
+        # Disegno il testo su nero: con LINE_AA l'immagine è già premoltiplicata per l'alpha della maschera
+        (width, height), baseline = cv2.getTextSize(text, self.font, scale, thickness)
+        baseline += thickness
+        size = (height + baseline, width + thickness, 3)
+        image = np.zeros(size, dtype=np.uint8)
+        mask = np.zeros(size, dtype=np.uint8)
+        cv2.putText(image, text, (0, height), self.font, scale, color, thickness, cv2.LINE_AA)
+        cv2.putText(mask, text, (0, height), self.font, scale, (255, 255, 255), thickness, cv2.LINE_AA)
+
+        layer = (image, cv2.bitwise_not(mask), height)
+        self._layers[key] = layer
+        if len(self._layers) > self.max_layers:
+            self._layers.popitem(last=False)
+        self.layers_rendered += 1
+        return layer
+
+    def text(self, frame, text, org, scale, color, thickness=2): # Stessa posizione (origine sulla linea di base) di cv2.putText
+        image, inverse_alpha, height = self._layer(text, scale, color, thickness)
+
+        # Ritaglio il livello sui bordi del frame
+        x, y = org[0], org[1] - height
+        top, left = max(0, -y), max(0, -x)
+        bottom = min(image.shape[0], frame.shape[0] - y)
+        right = min(image.shape[1], frame.shape[1] - x)
+        if top >= bottom or left >= right:
+            return
+
+        region = frame[y + top:y + bottom, x + left:x + right]
+        cv2.multiply(region, inverse_alpha[top:bottom, left:right], dst=region, scale=1.0 / 255.0)
+        cv2.add(region, image[top:bottom, left:right], dst=region)
+
+    def stats(self):
+        return {
+            'layers': len(self._layers),
+            'rendered': self.layers_rendered,
+            'reused': self.layers_reused,
+        }
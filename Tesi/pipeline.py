@@ -0,0 +1,366 @@
+import multiprocessing
+import queue
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from hand_roi import RegionOfInterest
+from telemetry import NULL_TELEMETRY
+
+# Pipeline a stadi: cattura (thread), MediaPipe Hands (processi worker), stato e disegno (processo principale).
+# I frame passano tra i processi in un anello di slot in memoria condivisa: ai worker arrivano solo
+# (numero di sequenza, slot), ai risultati si riassocia l'istante di cattura e si riordinano per sequenza.
+
+
+class DynamicHands: # Un'istanza a una mano mentre si compone la parola, quella a due mani solo ogni tanto per il gesto di reset
+
+    def __init__(self, hands_options, probe_interval=0.3):
+        import mediapipe as mp
+
+        options = {key: value for key, value in hands_options.items() if key != 'max_num_hands'}
+        self.single = mp.solutions.hands.Hands(max_num_hands=1, **options)
+        self.dual = mp.solutions.hands.Hands(max_num_hands=2, **options)
+        self.probe_interval = probe_interval  # Secondi tra due controlli della seconda mano
+
+        self.two_hands = False  # Con due mani in vista resto sull'istanza a due mani per non interrompere il countdown del reset
+        self._next_probe = 0.0
+        self._probed = False  # L'ultimo frame è passato dall'istanza a due mani
+        self._last_box = None
+        self._last_label = None
+
+        self.frames_single = 0
+        self.frames_dual = 0
+
+    def probe_due(self):
+        return self.two_hands or time.monotonic() >= self._next_probe
+
+    def process(self, image, probe=None): # Come Hands.process; probe viene deciso una volta sola per frame da _run_hands
+        if probe is None:
+            probe = self.probe_due()
+        self._probed = probe
+        if probe:
+            results = self.dual.process(image)
+            self.frames_dual += 1
+            self.two_hands = len(results.multi_hand_landmarks or []) >= 2
+            self._next_probe = time.monotonic() + self.probe_interval
+            return results
+
+        results = self.single.process(image)
+        self.frames_single += 1
+        return results
+
+    def observe(self, results): # Risultati nelle coordinate del frame intero, anche con il riquadro della mano
+        if self._probed:
+            self._last_box = self._last_label = None
+        elif self._second_hand_suspected(results):
+            self._next_probe = 0.0  # Controllo la seconda mano già al prossimo frame
+
+    def _second_hand_suspected(self, results): # La mano tracciata salta lontano o cambia lateralità: forse ce n'è un'altra
+        if not results.multi_hand_landmarks:
+            self._last_box = self._last_label = None
+            return False
+
+        points = np.array([(landmark.x, landmark.y) for landmark in results.multi_hand_landmarks[0].landmark])
+        box = (points.min(axis=0), points.max(axis=0))
+        label = results.multi_handedness[0].classification[0].label if results.multi_handedness else None
+
+        suspected = False
+        if self._last_box is not None:
+            size = (self._last_box[1] - self._last_box[0]).max()
+            jump = np.abs((box[0] + box[1]) - (self._last_box[0] + self._last_box[1])).max() / 2
+            suspected = jump > size or label != self._last_label
+
+        self._last_box = box
+        self._last_label = label
+        return suspected
+
+    def stats(self):
+        return {
+            'single_hand_frames': self.frames_single,
+            'two_hand_frames': self.frames_dual,
+        }
+
+    def close(self):
+        self.single.close()
+        self.dual.close()
+
+
+def create_hands(hands_options, dynamic=False): # Factory function per l'istanza di MediaPipe Hands usata dal tracker
+    if dynamic:
+        return DynamicHands(hands_options)
+    import mediapipe as mp
+    return mp.solutions.hands.Hands(**hands_options)
+
+
+def _run_hands(hands, frame, rgb, roi, telemetry=NULL_TELEMETRY): # Frame BGR -> risultati di MediaPipe in coordinate del frame intero
+    dynamic = isinstance(hands, DynamicHands)
+    probe = dynamic and hands.probe_due()  # Deciso una volta sola: vale sia per il riquadro sia per l'istanza di Hands
+
+    if roi is None:
+        with telemetry.measure('convert'):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        with telemetry.measure('inference'):
+            results = hands.process(rgb, probe) if dynamic else hands.process(rgb)
+    else:
+        # Il controllo della seconda mano ha senso solo sul frame intero, non sul riquadro della mano tracciata
+        with telemetry.measure('convert'):
+            image = roi.prepare(frame, full_frame=probe)
+        with telemetry.measure('inference'):
+            results = hands.process(image, probe) if dynamic else hands.process(image)
+        results = roi.update(results, frame.shape)
+
+    if dynamic:  # Riquadri della mano confrontati tra frame nelle stesse coordinate, anche se il riquadro si è spostato
+        hands.observe(results)
+    return results
+
+
+def results_to_arrays(output): # Solo i landmark (mani, 21, 3) e la lateralità tornano al processo principale
+    landmarks = np.array([[(l.x, l.y, l.z) for l in hand.landmark]
+                          for hand in output.multi_hand_landmarks or []], dtype=np.float32).reshape(-1, 21, 3)
+    handedness = [hand.classification[0].label for hand in output.multi_handedness or []]
+    return landmarks, handedness
+
+
+def _inference_worker(shm_name, ring_shape, tasks, results, hands_options, roi_options, dynamic_hands): # Processo worker con la propria istanza di Hands
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+    hands = create_hands(hands_options, dynamic_hands)
+    image = np.empty(ring_shape[1:], dtype=np.uint8)  # Buffer RGB riusato a ogni frame
+    roi = RegionOfInterest(**roi_options) if roi_options is not None else None  # Un riquadro per worker, come il tracking
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            sequence, slot = task
+
+            landmarks, handedness = results_to_arrays(_run_hands(hands, frames[slot], image, roi))
+            results.put((sequence, landmarks, handedness))
+    finally:
+        hands.close()
+        del frames
+        shm.close()
+
+
+def landmarks_to_proto(points): # Array (21, 3) -> NormalizedLandmarkList, per mp_drawing e per il resto del tracker
+    from mediapipe.framework.formats import landmark_pb2
+    return landmark_pb2.NormalizedLandmarkList(
+        landmark=[landmark_pb2.NormalizedLandmark(x=x, y=y, z=z) for x, y, z in points.tolist()])
+
+
+class HandsResults: # Stessa interfaccia dei risultati di hands.process usata dal tracker
+    def __init__(self, landmarks, handedness):
+        self.landmarks = landmarks
+        self.handedness = handedness
+        self.multi_hand_landmarks = [landmarks_to_proto(hand) for hand in landmarks] or None
+
+
+def mirror_results(results): # Specchio i risultati invece del frame: stesse coordinate che si avrebbero sull'immagine specchiata
+    for hand in results.multi_hand_landmarks or []:
+        for landmark in hand.landmark:
+            landmark.x = 1.0 - landmark.x
+    for hand in getattr(results, 'multi_hand_world_landmarks', None) or []:
+        for landmark in hand.landmark:
+            landmark.x = -landmark.x
+    for hand in results.multi_handedness or []:  # MediaPipe assume un'immagine già specchiata per la lateralità
+        classification = hand.classification[0]
+        classification.label = 'Left' if classification.label == 'Right' else 'Right'
+    return results
+
+
+def local_frames(capture, hands, mirror=True, roi=None, governor=None, telemetry=NULL_TELEMETRY): # Stessa interfaccia di HandsPipeline.frames ma con MediaPipe nel processo principale
+    rgb = None
+    display = None
+    results = None
+
+    while True:
+        with telemetry.measure('capture'):
+            success, frame, timestamp = capture.read()
+        if not success:
+            if not capture.isOpened():
+                print("Ignoring empty camera frame.")
+                return
+            continue
+
+        # Con la mano ferma il governor fa saltare l'inferenza e si riusano i risultati precedenti
+        if results is None or governor is None or governor.should_infer(timestamp):
+            start = time.perf_counter()
+
+            # Una sola conversione per l'inferenza sul frame non specchiato, in un buffer riusato
+            if rgb is None or rgb.shape != frame.shape:
+                rgb = np.empty_like(frame)
+                display = np.empty_like(frame)
+            results = _run_hands(hands, frame, rgb, roi, telemetry)
+            if mirror:
+                mirror_results(results)
+
+            if governor is not None:
+                governor.observe(results, timestamp, time.perf_counter() - start)
+
+        if mirror:
+            with telemetry.measure('flip'):
+                cv2.flip(frame, 1, dst=display)  # Il frame da disegnare viene preparato una volta sola
+            yield display, results, timestamp
+        else:
+            yield frame, results, timestamp
+
+
+class HandsPipeline: # Distribuisce i frame della camera su più processi MediaPipe e li restituisce in ordine
+
+    def __init__(self, capture, workers=2, slots=None, mirror=True, hands_options=None, roi_options=None,
+                 dynamic_hands=False, max_restarts=3):
+        self.capture = capture
+        self.workers = workers
+        self.slots = slots or workers + 1  # Uno slot per worker + quello che il processo principale sta disegnando
+        self.mirror = mirror
+        self.hands_options = hands_options or {}
+        self.roi_options = roi_options  # None: inferenza sempre sul frame intero
+        self.dynamic_hands = dynamic_hands
+        self.max_restarts = max_restarts  # Riavvii per worker prima di rinunciarvi
+
+        self._context = multiprocessing.get_context('spawn')  # I worker non ereditano thread o stato di MediaPipe
+        self._results = self._context.Queue()
+        self._workers = {}  # indice -> (processo, coda dei compiti): ogni worker ha la sua coda, così so quali frame aveva
+        self._restarts = {}  # indice -> riavvii
+        self._shm = None
+        self._frames = None
+        self._free_slots = deque(range(self.slots))
+        self._in_flight = {}  # sequenza -> (slot, istante di cattura, worker)
+
+        self.frames_submitted = 0
+        self.frames_emitted = 0
+        self.frames_failed = 0  # Frame persi perché il worker che li elaborava è terminato
+        self.restarts = 0
+
+    def _start(self, frame_shape): # Alloco la memoria condivisa e avvio i worker al primo frame, quando conosco la risoluzione
+        ring_shape = (self.slots,) + frame_shape
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(ring_shape)))
+        self._frames = np.ndarray(ring_shape, dtype=np.uint8, buffer=self._shm.buf)
+
+        for index in range(self.workers):
+            self._start_worker(index)
+
+    def _start_worker(self, index): # Coda nuova a ogni avvio: quella di un processo morto può essere in uno stato inconsistente
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_inference_worker,
+            args=(self._shm.name, self._frames.shape, tasks, self._results, self.hands_options, self.roi_options,
+                  self.dynamic_hands))
+        process.daemon = True
+        process.start()
+        self._workers[index] = (process, tasks)
+
+    def _check_workers(self): # Riavvia i worker terminati; restituisce le sequenze che erano loro assegnate
+        failed = []
+        for index, (process, tasks) in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            print(f"Il worker di MediaPipe {index} è terminato (codice {process.exitcode})")
+            failed.extend(sequence for sequence, (_, _, worker) in self._in_flight.items() if worker == index)
+            tasks.close()
+            del self._workers[index]
+
+            if self._restarts.get(index, 0) < self.max_restarts:
+                self._restarts[index] = self._restarts.get(index, 0) + 1
+                self.restarts += 1
+                self._start_worker(index)
+
+        if not self._workers:
+            raise RuntimeError("tutti i worker di MediaPipe sono terminati")
+        return failed
+
+    def _submit(self, frame, timestamp, sequence):
+        if self._frames is None:
+            self._start(frame.shape)
+
+        # Al worker con meno frame in volo
+        loads = {index: 0 for index in self._workers}
+        for _, _, worker in self._in_flight.values():
+            if worker in loads:
+                loads[worker] += 1
+        worker = min(loads, key=loads.get)
+
+        slot = self._free_slots.popleft()
+        if self.mirror:
+            cv2.flip(frame, 1, dst=self._frames[slot])  # Il flip scrive direttamente nello slot condiviso
+        else:
+            self._frames[slot] = frame
+
+        self._in_flight[sequence] = (slot, timestamp, worker)
+        self._workers[worker][1].put((sequence, slot))
+        self.frames_submitted += 1
+
+    def frames(self): # Generatore di (immagine BGR, risultati, istante di cattura) nello stesso ordine di cattura
+        next_submit = 0
+        next_emit = 0
+        pending = {}  # sequenza -> (landmark, lateralità), None se il frame è andato perso
+
+        try:
+            while True:
+                # Un frame in volo per worker: i frame in più aumenterebbero solo la latenza, meglio che li scarti la cattura
+                while self._free_slots and len(self._in_flight) < (len(self._workers) or self.workers):
+                    success, frame, timestamp = self.capture.read(timeout=0.005 if self._in_flight else 1.0)
+                    if not success:
+                        break
+                    self._submit(frame, timestamp, next_submit)
+                    next_submit += 1
+
+                if not self._in_flight:
+                    if not self.capture.isOpened():
+                        return
+                    continue
+
+                try:
+                    busy = len(self._in_flight) >= len(self._workers)  # Con un worker libero torno presto a leggere la camera
+                    sequence, landmarks, handedness = self._results.get(timeout=1.0 if busy else 0.005)
+                    if sequence in self._in_flight:  # Un risultato arrivato dopo la morte del worker vale comunque
+                        pending[sequence] = (landmarks, handedness)
+                except queue.Empty:
+                    for sequence in self._check_workers():
+                        pending.setdefault(sequence, None)
+
+                # Emetto i risultati solo in ordine di sequenza, saltando i frame persi
+                while next_emit in pending:
+                    output = pending.pop(next_emit)
+                    slot, timestamp, _ = self._in_flight.pop(next_emit)
+                    next_emit += 1
+                    if output is None:
+                        self._free_slots.append(slot)
+                        self.frames_failed += 1
+                        continue
+                    yield self._frames[slot], HandsResults(*output), timestamp
+                    self._free_slots.append(slot)  # Lo slot torna libero quando il chiamante passa al frame successivo
+                    self.frames_emitted += 1
+        finally:
+            self.close()
+
+    def stats(self): # I frame scartati perché la pipeline era piena sono contati dallo stadio di cattura
+        return {
+            'workers': self.workers,
+            'submitted': self.frames_submitted,
+            'emitted': self.frames_emitted,
+            'failed': self.frames_failed,
+            'restarts': self.restarts,
+            'in_flight': len(self._in_flight),
+        }
+
+    def close(self): # Pulizia delle risorse; si può chiamare più volte
+        workers, self._workers = self._workers, {}
+        for _, tasks in workers.values():
+            tasks.put(None)
+        for process, _ in workers.values():
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        if self._shm is not None:
+            shm, self._shm = self._shm, None
+            self._frames = None
+            try:
+                shm.close()
+            except BufferError:  # Il chiamante tiene ancora un riferimento all'ultimo frame
+                pass
+            shm.unlink()
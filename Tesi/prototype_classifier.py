@@ -0,0 +1,87 @@
+import numpy as np
+
+from landmark_geometry import HandFeatures, WRIST, MIDDLE_FINGER_MCP, NUM_LANDMARKS, landmarks_to_array
+
+# Rapporto larghezza/altezza della cattura (1280x720): x e y di MediaPipe sono normalizzati su lati diversi
+DEFAULT_ASPECT_RATIO = 1280 / 720
+
+
+def normalize_landmarks(points, aspect_ratio=DEFAULT_ASPECT_RATIO): # (N, 21, 3) -> (N, 63) invariante a posizione, scala e rotazione
+    points = np.array(points, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 3)
+    points[:, :, 0] *= aspect_ratio
+
+    # Polso nell'origine
+    points -= points[:, WRIST:WRIST + 1, :]
+
+    # Ruoto nel piano dell'immagine in modo che il vettore polso -> MCP del medio punti verso l'alto
+    palm = points[:, MIDDLE_FINGER_MCP, :2]
+    scale = np.linalg.norm(palm, axis=1)
+    angle = -np.arctan2(palm[:, 0], -palm[:, 1])
+    cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    x, y = points[:, :, 0].copy(), points[:, :, 1].copy()
+    points[:, :, 0] = cos * x - sin * y
+    points[:, :, 1] = sin * x + cos * y
+
+    # La lunghezza del palmo fa da unità di misura
+    points /= np.maximum(scale, 1e-9)[:, None, None]
+
+    return points.reshape(points.shape[0], -1)
+
+
+class PrototypeClassifier: # Classificatore a prototipo più vicino: restituisce le k lettere più vicine con le distanze
+
+    def __init__(self, prototypes, labels, max_distance=None, aspect_ratio=DEFAULT_ASPECT_RATIO):
+        labels = np.asarray(labels)
+        order = np.argsort(labels, kind='stable')  # Prototipi raggruppati per lettera per il minimo per lettera
+        self.prototypes = np.asarray(prototypes, dtype=np.float64)[order]
+        labels = labels[order]
+        self.letters, self._letter_starts = np.unique(labels, return_index=True)
+        self._squared_norms = np.einsum('ij,ij->i', self.prototypes, self.prototypes)
+        self.max_distance = max_distance  # Oltre questa distanza non riconosco nessuna lettera
+        self.aspect_ratio = aspect_ratio
+        self.last_letter = ''
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as index:
+            max_distance = float(index['max_distance']) if 'max_distance' in index else None
+            aspect_ratio = float(index['aspect_ratio']) if 'aspect_ratio' in index else DEFAULT_ASPECT_RATIO
+            return cls(index['prototypes'], index['labels'], max_distance, aspect_ratio)
+
+    def letter_distances(self, points): # (N, 21, 3) -> (N, lettere): distanza dal prototipo più vicino di ogni lettera
+        queries = normalize_landmarks(points, self.aspect_ratio)
+        squared = (np.einsum('ij,ij->i', queries, queries)[:, None] + self._squared_norms[None, :]
+                   - 2.0 * queries @ self.prototypes.T)
+        distances = np.sqrt(np.maximum(squared, 0.0))
+        return np.minimum.reduceat(distances, self._letter_starts, axis=1)
+
+    def top_k(self, landmarks, k=3): # Le k lettere più vicine come lista di (lettera, distanza)
+        distances = self.letter_distances(_as_points(landmarks))[0]
+        k = min(k, len(self.letters))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(str(self.letters[i]), float(distances[i])) for i in nearest]
+
+    def recognize(self, landmarks):
+        letter, distance = self.top_k(landmarks, k=1)[0]
+        if self.max_distance is not None and distance > self.max_distance:
+            letter = ''
+        self.last_letter = letter
+        return letter
+
+    def recognize_batch(self, points):
+        distances = self.letter_distances(points)
+        best = distances.argmin(axis=1)
+        labels = self.letters[best].astype(str)
+        if self.max_distance is not None:
+            labels[distances[np.arange(len(best)), best] > self.max_distance] = ''
+        return labels.tolist()
+
+    def reset(self): # Stessa interfaccia di LetterRecognizer
+        self.last_letter = ''
+
+
+def _as_points(landmarks):
+    if isinstance(landmarks, HandFeatures):
+        return landmarks.points
+    return landmarks_to_array(landmarks)
@@ -0,0 +1,123 @@
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Una regola è la congiunzione di termini; un termine è una tupla (primitiva, *argomenti)
+# e la primitiva viene chiamata come primitiva(features, *argomenti).
+# Termini uguali in lettere diverse vengono valutati una volta sola.
+Term = Tuple
+Rules = Dict[str, Sequence[Term]]
+
+
+def evaluate_term(term: Term, features):
+    return term[0](features, *term[1:])
+
+
+def term_selectivity(rules: Rules, features) -> Dict[Term, float]: # Frequenza con cui ogni termine è vero su un batch di frame registrati
+    selectivity = {}
+    for conditions in rules.values():
+        for term in conditions:
+            if term not in selectivity:
+                selectivity[term] = float(np.mean(evaluate_term(term, features)))
+    return selectivity
+
+
+class CompiledRules: # Regole compilate in un albero di decisione che valuta ogni termine al più una volta per frame
+
+    def __init__(self, rules: Rules, selectivity: Optional[Dict[Term, float]] = None):
+        self.letters = list(rules)  # L'ordine del dizionario è la priorità tra lettere
+        self.terms: List[Term] = []
+        self.term_index: Dict[Term, int] = {}
+        self.letter_terms: Dict[str, Tuple[int, ...]] = {}
+
+        for letter, conditions in rules.items():
+            indices = []
+            for term in conditions:
+                if term not in self.term_index:
+                    self.term_index[term] = len(self.terms)
+                    self.terms.append(term)
+                indices.append(self.term_index[term])
+            self.letter_terms[letter] = tuple(dict.fromkeys(indices))
+
+        # Probabilità che un termine sia vero: senza dati registrati la stimo a 0.5
+        selectivity = selectivity or {}
+        self.p_true = [selectivity.get(term, 0.5) for term in self.terms]
+
+        self._nodes = {}
+        candidates = tuple((letter, frozenset(self.letter_terms[letter])) for letter in self.letters)
+        self.tree = self._build_tree(candidates)
+        self.node_count = len(self._nodes)
+        self._nodes = None
+
+    def _build_tree(self, candidates):
+        # Foglia: nessun candidato rimasto, oppure il candidato più prioritario ha tutti i termini verificati
+        if not candidates:
+            return ''
+        first_letter, first_remaining = candidates[0]
+        if not first_remaining:
+            return first_letter
+
+        if candidates in self._nodes:
+            return self._nodes[candidates]
+
+        # Tra i termini del candidato più prioritario scelgo quello che in media elimina più candidati
+        # (quelli che lo richiedono, se risulta falso); limitarsi al primo candidato tiene l'albero piccolo
+        counts = Counter(term for _, remaining in candidates for term in remaining)
+        term = max(first_remaining, key=lambda t: ((1.0 - self.p_true[t]) * counts[t], -t))
+
+        if_true = self._build_tree(tuple((letter, remaining - {term}) for letter, remaining in candidates))
+        if_false = self._build_tree(tuple((letter, remaining) for letter, remaining in candidates
+                                          if term not in remaining))
+
+        node = (term, if_true, if_false)
+        self._nodes[candidates] = node
+        return node
+
+    def new_memo(self) -> list: # Valori dei termini già calcolati per il frame corrente
+        return [None] * len(self.terms)
+
+    def term_value(self, term: int, features, memo: list) -> bool:
+        value = memo[term]
+        if value is None:
+            value = memo[term] = bool(evaluate_term(self.terms[term], features))
+        return value
+
+    def classify(self, features, memo: Optional[list] = None) -> str: # Percorre l'albero per un singolo frame
+        node = self.tree
+        if memo is None:
+            terms = self.terms
+            while node.__class__ is tuple:
+                term, if_true, if_false = node
+                node = if_true if evaluate_term(terms[term], features) else if_false
+        else:
+            while node.__class__ is tuple:
+                term, if_true, if_false = node
+                node = if_true if self.term_value(term, features, memo) else if_false
+        return node
+
+    def matches(self, letter: str, features, memo: Optional[list] = None) -> bool: # Verifica la regola di una sola lettera
+        if memo is None:
+            return all(evaluate_term(self.terms[term], features) for term in self.letter_terms[letter])
+        return all(self.term_value(term, features, memo) for term in self.letter_terms[letter])
+
+    def classify_batch(self, features, size: int) -> np.ndarray: # Valuta ogni termine una volta come maschera su tutto il batch
+        masks = [np.broadcast_to(evaluate_term(term, features), (size,)) for term in self.terms]
+        labels = np.full(size, '', dtype=f'<U{max(map(len, self.letters), default=1)}')
+        undecided = np.ones(size, dtype=bool)
+
+        for letter in self.letters:
+            matched = undecided.copy()
+            for term in self.letter_terms[letter]:
+                matched &= masks[term]
+            labels[matched] = letter
+            undecided &= ~matched
+            if not undecided.any():
+                break
+
+        return labels
+
+
+def compile_rules(rules: Rules, samples=None) -> CompiledRules: # samples: feature batch di frame registrati per ordinare i termini per selettività
+    selectivity = term_selectivity(rules, samples) if samples is not None else None
+    return CompiledRules(rules, selectivity)
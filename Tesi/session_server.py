@@ -0,0 +1,308 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from capture import create_capture
+from pipeline import _run_hands, create_hands, results_to_arrays
+from spelling_session import SpellingSession
+
+# Più postazioni su una sola macchina: ogni flusso (camera o video) ha la propria cattura e la propria SpellingSession,
+# MediaPipe gira in un gruppo limitato di processi worker. Ogni flusso è assegnato sempre allo stesso worker,
+# che tiene un'istanza di Hands per flusso, così il tracking tra un frame e il successivo non si perde.
+
+HANDS_OPTIONS = dict(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.7)
+
+
+def _stream_worker(tasks, results, hands_options): # Processo worker: un'istanza di Hands e un'area condivisa per ogni flusso assegnato
+    streams = {}  # flusso -> (memoria condivisa, frame, buffer RGB, hands)
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            stream_id, sequence, shm_name, shape = task
+
+            if stream_id not in streams or streams[stream_id][0].name != shm_name:  # Nuovo flusso o risoluzione cambiata
+                if stream_id in streams:
+                    frame = None  # Il frame del giro precedente non deve tenere aperta la memoria condivisa
+                    _close_stream(streams, stream_id)
+                shm = shared_memory.SharedMemory(name=shm_name)
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                streams[stream_id] = (shm, frame, np.empty(shape, dtype=np.uint8), create_hands(hands_options))
+            _, frame, rgb, hands = streams[stream_id]
+
+            landmarks, handedness = results_to_arrays(_run_hands(hands, frame, rgb, None))
+            results.put((stream_id, sequence, landmarks, handedness))
+    finally:
+        frame = None
+        for stream_id in list(streams):
+            _close_stream(streams, stream_id)
+
+
+def _close_stream(streams, stream_id): # Chiude Hands e la memoria condivisa di un flusso del worker
+    shm, frame, rgb, hands = streams.pop(stream_id)
+    hands.close()
+    del frame, rgb
+    shm.close()
+
+
+class Stream: # Una postazione: cattura, frame in volo (al più uno) e stato della composizione
+
+    def __init__(self, stream_id, source, session, worker, mirror=True, realtime=False):
+        self.id = stream_id
+        self.source = source
+        self.capture = create_capture(source, realtime=realtime)  # I video vengono letti tutti, frame per frame
+        self.session = session
+        self.worker = worker  # Indice del worker che tiene il tracking di questo flusso
+        self.mirror = mirror
+
+        self.shm = None
+        self.frame = None
+        self.in_flight = None  # Istante di cattura del frame in elaborazione, None se il flusso è libero
+        self.submitted_at = None
+        self.sequence = 0  # Numero del frame inviato: un risultato arrivato dopo la morte del worker va ignorato
+        self.last_timestamp = 0.0
+        self.finished = False  # Fine del video già comunicata alla sessione
+
+        self.frames_processed = 0
+        self.frames_failed = 0  # Frame persi perché il worker che li elaborava è terminato
+        self._timestamps = deque(maxlen=120)
+        self._latencies = deque(maxlen=300)
+
+    def submit(self, frame, timestamp, tasks):
+        if self.shm is None or self.frame.shape != frame.shape:
+            self._release_shm()
+            self.shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+            self.frame = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+        if self.mirror:
+            cv2.flip(frame, 1, dst=self.frame)
+        else:
+            self.frame[...] = frame
+        self.in_flight = timestamp
+        self.submitted_at = time.time()
+        self.sequence += 1
+        tasks.put((self.id, self.sequence, self.shm.name, frame.shape))
+
+    def complete(self, landmarks, now): # Risultato del worker: avanza la sessione e restituisce gli eventi
+        timestamp = self.in_flight
+        self.in_flight = None
+        self.last_timestamp = timestamp
+        self.frames_processed += 1
+        self._timestamps.append(now)
+        # Per i video gli istanti sono quelli del file: la latenza parte dall'invio al worker
+        self._latencies.append(now - (timestamp if self.capture.live else self.submitted_at))
+        return self.session.step(list(landmarks), timestamp)
+
+    def fail(self): # Il worker è terminato con il frame in volo: il frame va perso
+        self.in_flight = None
+        self.frames_failed += 1
+
+    def finish(self): # Fine del flusso: come se le mani uscissero dall'inquadratura, la parola in corso diventa la frase
+        self.finished = True
+        return self.session.step([], self.last_timestamp)
+
+    def stats(self):
+        fps = 0.0
+        if len(self._timestamps) >= 2 and self._timestamps[-1] > self._timestamps[0]:
+            fps = (len(self._timestamps) - 1) / (self._timestamps[-1] - self._timestamps[0])
+        latencies = np.array(self._latencies) * 1000.0 if self._latencies else np.zeros(1)
+        return {
+            'source': self.source,
+            'worker': self.worker,
+            'processed': self.frames_processed,
+            'failed': self.frames_failed,
+            'fps': round(fps, 1),
+            'latency_ms': round(float(latencies.mean()), 1),
+            'latency_p95_ms': round(float(np.percentile(latencies, 95)), 1),
+            'camera': self.capture.stats(),
+        }
+
+    def _release_shm(self):
+        if self.shm is not None:
+            self.frame = None
+            try:
+                self.shm.close()
+            except BufferError:
+                pass
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self.capture.release()
+        self._release_shm()
+
+
+class SessionServer: # Distribuisce i frame di più flussi su un gruppo limitato di worker MediaPipe
+
+    def __init__(self, sources, workers=2, hands_options=None, recognizer_factory=None, autocorrector=None, mirror=True,
+                 realtime=False, max_restarts=3):
+        self.workers = max(1, min(workers, len(sources)))
+        self.hands_options = hands_options or HANDS_OPTIONS
+        self.max_restarts = max_restarts  # Riavvii per worker prima di spostarne i flussi sugli altri
+        self._context = multiprocessing.get_context('spawn')
+        self._results = self._context.Queue()
+        self._workers = {}  # indice -> (processo, coda dei compiti): una coda per worker, affinità flusso -> worker
+        self._restarts = {}
+        self.restarts = 0
+
+        for index in range(self.workers):
+            self._start_worker(index)
+
+        # I flussi sono distribuiti a turno sui worker; l'autocorrettore è condiviso, il riconoscitore no (ha stato)
+        self.streams = [
+            Stream(stream_id, source,
+                   SpellingSession(recognizer_factory() if recognizer_factory else None, autocorrector),
+                   stream_id % self.workers, mirror, realtime)
+            for stream_id, source in enumerate(sources)]
+        self._next = 0
+
+    def _start_worker(self, index): # Coda nuova a ogni avvio: quella di un processo morto può essere in uno stato inconsistente
+        tasks = self._context.Queue()
+        process = self._context.Process(target=_stream_worker, args=(tasks, self._results, self.hands_options))
+        process.daemon = True
+        process.start()
+        self._workers[index] = (process, tasks)
+
+    def _check_workers(self): # Riavvia i worker terminati; i frame che avevano in volo vanno persi
+        for index, (process, tasks) in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            print(f"Il worker di MediaPipe {index} è terminato (codice {process.exitcode})", file=sys.stderr)
+            tasks.close()
+            del self._workers[index]
+            for stream in self.streams:
+                if stream.worker == index and stream.in_flight is not None:
+                    stream.fail()
+
+            if self._restarts.get(index, 0) < self.max_restarts:
+                self._restarts[index] = self._restarts.get(index, 0) + 1
+                self.restarts += 1
+                self._start_worker(index)
+
+        if not self._workers:
+            raise RuntimeError("tutti i worker di MediaPipe sono terminati")
+        for stream in self.streams:  # Flussi di un worker abbandonato: passano a quello rimasto con meno flussi
+            if stream.worker not in self._workers:
+                load = {index: sum(other.worker == index for other in self.streams) for index in self._workers}
+                stream.worker = min(load, key=load.get)
+
+    def _schedule(self): # Giro equo sui flussi liberi: ognuno ha al più un frame in volo, le code dei worker sono FIFO
+        for offset in range(len(self.streams)):
+            stream = self.streams[(self._next + offset) % len(self.streams)]
+            if stream.in_flight is not None:
+                continue
+            success, frame, timestamp = stream.capture.read(timeout=0)
+            if success:
+                stream.submit(frame, timestamp, self._workers[stream.worker][1])
+        self._next = (self._next + 1) % len(self.streams)
+
+    def run(self, on_events, duration=None): # on_events(flusso, eventi); restituisce True quando tutti i flussi sono finiti
+        end = time.time() + duration if duration else None
+
+        while end is None or time.time() < end:
+            self._schedule()
+            for stream in self.streams:  # Video finito: la sessione riceve un ultimo frame senza mani, una volta sola
+                if not stream.finished and stream.in_flight is None and not stream.capture.isOpened():
+                    events = stream.finish()
+                    if events:
+                        on_events(stream, events)
+
+            busy = [stream for stream in self.streams if stream.in_flight is not None]
+            if not busy:
+                if not any(stream.capture.isOpened() for stream in self.streams):
+                    return True
+                time.sleep(0.002)  # Nessun frame nuovo da nessuna camera
+                continue
+
+            try:
+                stream_id, sequence, landmarks, handedness = self._results.get(timeout=0.005)
+            except queue.Empty:
+                self._check_workers()
+                continue
+
+            stream = self.streams[stream_id]
+            if stream.in_flight is None or sequence != stream.sequence:  # Frame già dato per perso
+                continue
+            events = stream.complete(landmarks, time.time())
+            if events:
+                on_events(stream, events)
+        return False
+
+    def stats(self):
+        return [stream.stats() for stream in self.streams]
+
+    def close(self): # Pulizia delle risorse
+        workers, self._workers = self._workers, {}
+        for _, tasks in workers.values():
+            tasks.put(None)
+        for process, _ in workers.values():
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        for stream in self.streams:
+            stream.close()
+
+
+def _parse_source(source): # "0" -> camera 0, altrimenti percorso di un video
+    return int(source) if source.isdigit() else source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server di più postazioni LIS con un gruppo condiviso di worker MediaPipe")
+    parser.add_argument('sources', nargs='+', help="indici delle camere o percorsi dei video")
+    parser.add_argument('-w', '--workers', type=int, default=2, help="processi MediaPipe")
+    parser.add_argument('-o', '--output', help="file JSONL degli eventi (default: standard output)")
+    parser.add_argument('--duration', type=float, default=None, help="secondi di esecuzione (default: fino alla fine dei flussi)")
+    parser.add_argument('--stats-interval', type=float, default=5.0, help="ogni quanti secondi stampare le statistiche")
+    parser.add_argument('--no-autocorrect', dest='autocorrect', action='store_false')
+    parser.add_argument('--realtime', action='store_true',
+                        help="legge i video alla velocità dei loro fps invece che il prima possibile")
+    args = parser.parse_args()
+
+    autocorrector = None
+    if args.autocorrect:
+        from autocorrection import create_autocorrector
+        autocorrector = create_autocorrector()
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    server = SessionServer([_parse_source(source) for source in args.sources], args.workers, autocorrector=autocorrector,
+                           realtime=args.realtime)
+
+    def on_events(stream, events):
+        for event in events:
+            output.write(json.dumps(dict(event, stream=stream.id), ensure_ascii=False) + '\n')
+        output.flush()
+
+    start = time.time()
+    try:
+        # Il server gira a fette di stats_interval secondi; tra una fetta e l'altra stampo le statistiche per flusso
+        while True:
+            interval = args.stats_interval
+            if args.duration is not None:
+                interval = min(interval, start + args.duration - time.time())
+                if interval <= 0:
+                    break
+            finished = server.run(on_events, duration=interval)
+            for stream_stats in server.stats():
+                print(stream_stats, file=sys.stderr)
+            if finished:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == '__main__':
+    main()
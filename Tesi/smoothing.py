@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+
+# Filtri temporali sui landmark e isteresi sull'etichetta riconosciuta: un singolo frame di tremolio
+# (M/N, U/V) non deve più far ripartire il timer della lettera.
+
+
+class OneEuroFilter: # Filtro One Euro (Casiez et al.): forte smorzamento da fermi, poco ritardo quando la mano si muove
+
+    def __init__(self, min_cutoff=1.5, beta=2.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff  # Frequenza di taglio da fermi, in Hz: più bassa = meno tremolio
+        self.beta = beta  # Quanto la frequenza di taglio sale con la velocità: più alto = meno ritardo nei movimenti
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._derivative = None
+        self._timestamp = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, points, timestamp): # points (21, 3) -> points filtrati, stessa forma
+        points = np.asarray(points, dtype=np.float64)
+        if self._value is None:
+            self._value = points.copy()
+            self._derivative = np.zeros_like(points)
+            self._timestamp = timestamp
+            return self._value
+
+        dt = timestamp - self._timestamp
+        if dt <= 0:
+            return self._value
+        self._timestamp = timestamp
+
+        alpha_d = self._alpha(self.d_cutoff, dt)
+        self._derivative = alpha_d * (points - self._value) / dt + (1.0 - alpha_d) * self._derivative
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self._derivative)
+        alpha = self._alpha(cutoff, dt)
+        self._value = alpha * points + (1.0 - alpha) * self._value
+        return self._value
+
+
+class ExponentialFilter: # Media mobile esponenziale: più semplice, ritardo costante
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha  # Peso del frame nuovo
+        self.reset()
+
+    def reset(self):
+        self._value = None
+
+    def __call__(self, points, timestamp):
+        points = np.asarray(points, dtype=np.float64)
+        if self._value is None:
+            self._value = points.copy()
+        else:
+            self._value = self.alpha * points + (1.0 - self.alpha) * self._value
+        return self._value
+
+
+class LabelHysteresis: # Un'etichetta nuova sostituisce quella stabile solo dopo essere stata vista per frames frame consecutivi
+
+    def __init__(self, frames=3):
+        self.frames = frames
+        self.reset()
+
+    def reset(self):
+        self.stable = None
+        self._candidate = None
+        self._count = 0
+
+    def __call__(self, label):
+        if self.stable is None or label == self.stable:
+            self.stable = label
+            self._candidate = None
+            return label
+
+        if label == self._candidate:
+            self._count += 1
+        else:
+            self._candidate = label
+            self._count = 1
+
+        if self._count >= self.frames:
+            self.stable = label
+            self._candidate = None
+        return self.stable
+
+
+def create_filters(smoothing='none', hysteresis_frames=0): # Da opzioni a riga di comando a (filtro dei landmark, isteresi)
+    landmark_filter = None
+    if smoothing == 'one-euro':
+        landmark_filter = OneEuroFilter()
+    elif smoothing == 'exponential':
+        landmark_filter = ExponentialFilter()
+    elif smoothing != 'none':
+        raise ValueError(f"Filtro sconosciuto: {smoothing}")
+
+    label_filter = LabelHysteresis(hysteresis_frames) if hysteresis_frames > 1 else None
+    return landmark_filter, label_filter
+
+
+SMOOTHING_CHOICES = ['none', 'one-euro', 'exponential']
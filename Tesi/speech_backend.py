@@ -0,0 +1,280 @@
+import itertools
+import multiprocessing
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import Future
+
+# La sintesi vocale gira in un processo separato: runAndWait di pyttsx3 è bloccante, non è affidabile tra thread
+# e nel processo del tracker si contenderebbe il GIL con il ciclo video. Le richieste restituiscono subito un Future;
+# se il processo muore viene riavviato e le richieste in corso falliscono.
+
+
+class Pyttsx3Engine: # Voce di sistema tramite pyttsx3 (SAPI5, NSSpeechSynthesizer, espeak)
+
+    def __init__(self, rate=200):
+        import pyttsx3
+        self.engine = pyttsx3.init()  # Inizializzazione del motore di sintesi vocale
+
+        try: # Impostazione della voce in italiano se disponibile
+            voices = self.engine.getProperty('voices')
+            italian_voice = next((voice for voice in voices if 'italian' in voice.languages), None)
+            if italian_voice:
+                self.engine.setProperty('voice', italian_voice.id)
+        except Exception:
+            pass
+
+        self.engine.setProperty('rate', rate) # Da qua posso impostare la velocità del parlato
+
+    def voice(self):
+        return str(self.engine.getProperty('voice')), self.engine.getProperty('rate')
+
+    def speak(self, text):
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+    def render(self, text, path):
+        self.engine.save_to_file(text, path)
+        self.engine.runAndWait()
+
+    def close(self):
+        self.engine.stop()
+
+
+class EspeakEngine: # espeak-ng da riga di comando: nessuna dipendenza Python, disponibile su quasi ogni Linux
+
+    def __init__(self, voice='it', rate=200, executable='espeak-ng'):
+        self.executable = shutil.which(executable) or shutil.which('espeak')
+        if self.executable is None:
+            raise RuntimeError(f"{executable} non trovato nel PATH")
+        self.voice_name = voice
+        self.rate = rate
+
+    def _run(self, *options, text):
+        command = [self.executable, '-v', self.voice_name, '-s', str(self.rate), *options, '--stdin']
+        subprocess.run(command, input=text.encode('utf-8'), check=True, stdout=subprocess.DEVNULL)
+
+    def voice(self):
+        return f"espeak-{self.voice_name}", self.rate
+
+    def speak(self, text):
+        self._run(text=text)
+
+    def render(self, text, path):
+        self._run('-w', path, text=text)
+
+    def close(self):
+        pass
+
+
+class StubEngine: # Nessun audio: registra le chiamate, per provare il percorso della voce su macchine senza scheda audio
+
+    def __init__(self, rate=200, seconds_per_char=0.0):
+        self.rate = rate
+        self.seconds_per_char = seconds_per_char  # Durata simulata del parlato
+        self.calls = []
+
+    def voice(self):
+        return 'stub', self.rate
+
+    def speak(self, text):
+        self.calls.append(('speak', text))
+        time.sleep(len(text) * self.seconds_per_char)
+
+    def render(self, text, path): # Un WAV di silenzio, così la cache delle frasi funziona anche senza voce
+        self.calls.append(('render', text))
+        with wave.open(path, 'wb') as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(16000)
+            writer.writeframes(b'\0\0' * 1600)
+
+    def history(self):
+        return list(self.calls)
+
+    def close(self):
+        pass
+
+
+ENGINES = {'pyttsx3': Pyttsx3Engine, 'espeak': EspeakEngine, 'stub': StubEngine}
+BACKEND_CHOICES = list(ENGINES)
+
+
+def _speech_worker(engine_name, options, requests, responses): # Processo della voce: esegue le richieste una alla volta
+    try:
+        engine = ENGINES[engine_name](**options)
+    except Exception as e:
+        responses.put((0, False, f"Errore nell'inizializzazione della voce {engine_name}: {e}"))
+        return
+    responses.put((0, True, None))
+
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            request_id, kind, args = request
+            try:
+                responses.put((request_id, True, getattr(engine, kind)(*args)))
+            except Exception as e:
+                responses.put((request_id, False, f"{kind}: {e}"))
+    finally:
+        engine.close()
+
+
+class SpeechBackend: # Interfaccia verso il processo della voce: speak, render e voice restituiscono un Future
+
+    def __init__(self, engine='pyttsx3', options=None, startup_timeout=30.0):
+        if engine not in ENGINES:
+            raise ValueError(f"Motore di sintesi sconosciuto: {engine}")
+        self.engine = engine
+        self.options = options or {}
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}  # richiesta -> (Future, tipo)
+
+        self.requests = 0
+        self.failures = 0
+        self.restarts = 0
+        self.is_running = True
+
+        self._start()
+        deadline = time.time() + startup_timeout
+        while True:  # Attendo che il processo abbia creato la voce
+            try:
+                _, ok, error = self._responses.get(timeout=0.2)
+                break
+            except queue.Empty:
+                if not self._process.is_alive() or time.time() > deadline:
+                    ok, error = False, "il processo della voce non si è avviato"
+                    break
+        if not ok:
+            self._stop_process()
+            raise RuntimeError(error)
+
+        self._reader = threading.Thread(target=self._read_responses)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def _start(self): # Code nuove a ogni avvio: quelle di un processo morto possono essere in uno stato inconsistente
+        self._requests = self._context.Queue()
+        self._responses = self._context.Queue()
+        self._process = self._context.Process(target=_speech_worker,
+                                              args=(self.engine, self.options, self._requests, self._responses))
+        self._process.daemon = True
+        self._process.start()
+
+    def _stop_process(self):
+        self._process.terminate()
+        self._process.join(timeout=2.0)
+
+    def _read_responses(self): # Thread che completa i Future e si accorge se il processo è morto
+        while self.is_running:
+            with self._lock:
+                responses, process = self._responses, self._process
+            try:
+                request_id, ok, value = responses.get(timeout=0.2)
+            except queue.Empty:
+                if self.is_running and not process.is_alive():
+                    self._restart(process, RuntimeError("il processo della voce è terminato"))
+                continue
+            except (EOFError, OSError):
+                continue
+
+            if request_id == 0 and not ok:  # Il processo riavviato non riesce a creare la voce: non ci riprovo
+                print(value)
+                self.is_running = False
+                self._restart(process, RuntimeError(value))
+                break
+
+            with self._lock:
+                if responses is not self._responses:  # Risposta di un processo già sostituito
+                    continue
+                future, kind = self._pending.pop(request_id, (None, None))
+            if future is None or not future.set_running_or_notify_cancel():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                self.failures += 1
+                future.set_exception(RuntimeError(value))
+
+    def _restart(self, process, error=None): # Riavvia il processo; le richieste in corso falliscono (o vengono annullate)
+        with self._lock:
+            if process is not self._process:
+                return
+            if process.is_alive():
+                self._stop_process()
+            pending, self._pending = self._pending, {}
+            self.restarts += 1
+            if self.is_running:
+                self._start()
+
+        for future, kind in pending.values():
+            if error is None:
+                future.cancel()
+            elif future.set_running_or_notify_cancel():
+                self.failures += 1
+                future.set_exception(error)
+
+    def _submit(self, kind, *args):
+        future = Future()
+        if not self.is_running:
+            future.set_exception(RuntimeError("il processo della voce non è attivo"))
+            return future
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, kind)
+            self._requests.put((request_id, kind, args))
+            self.requests += 1
+        return future
+
+    def speak(self, text):
+        return self._submit('speak', text)
+
+    def render(self, text, path): # Sintesi su file WAV
+        return self._submit('render', text, path)
+
+    def voice(self): # (voce, velocità): identifica l'audio prodotto, per le cache
+        return self._submit('voice')
+
+    def history(self): # Solo con il motore stub: le chiamate ricevute dal processo
+        return self._submit('history')
+
+    def interrupt(self): # Interrompe la frase in corso: il processo viene riavviato solo se sta parlando
+        with self._lock:
+            process = self._process
+            speaking = any(kind == 'speak' for _, kind in self._pending.values())
+        if speaking:
+            self._restart(process)
+
+    def stats(self):
+        return {
+            'engine': self.engine,
+            'requests': self.requests,
+            'pending': len(self._pending),
+            'failures': self.failures,
+            'restarts': self.restarts,
+        }
+
+    def close(self): # Pulizia delle risorse
+        self.is_running = False
+        with self._lock:
+            self._requests.put(None)
+            process = self._process
+        process.join(timeout=2.0)
+        if process.is_alive():
+            process.terminate()
+        self._reader.join(timeout=1.0)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, kind in pending.values():
+            future.cancel()
+
+
+def create_speech_backend(engine='pyttsx3', **options): # Factory function per il processo della voce
+    return SpeechBackend(engine, options)
@@ -0,0 +1,185 @@
+from landmark_geometry import (LetterRecognizer, RecognitionCache, landmarks_to_array, QUANTIZATION_STEP,
+                               RECOGNITION_CACHE_SIZE)
+from telemetry import NULL_TELEMETRY
+
+LETTER_SAVE_DELAY = 1.5
+HAND_DETECTION_DELAY = 1.5
+RESET_DELAY = 2
+SPACE_DELAY = 1.2
+
+
+def _event(kind, timestamp, **data):
+    return dict(type=kind, time=timestamp, **data)
+
+
+class SpellingSession: # Logica di composizione (lettere, spazi, reset, autocorrezione) guidata solo dai landmark e dagli istanti dei frame
+
+    def __init__(self, recognizer=None, autocorrector=None, letter_save_delay=LETTER_SAVE_DELAY,
+                 hand_detection_delay=HAND_DETECTION_DELAY, reset_delay=RESET_DELAY, space_delay=SPACE_DELAY,
+                 telemetry=NULL_TELEMETRY, landmark_filter=None, label_filter=None,
+                 quantization_step=QUANTIZATION_STEP, recognition_cache_size=RECOGNITION_CACHE_SIZE):
+        self.recognizer = recognizer or LetterRecognizer()
+        self.recognition_cache = RecognitionCache(self.recognizer, quantization_step=quantization_step,
+                                                  max_size=recognition_cache_size)
+        self.autocorrector = autocorrector  # None: la frase composta non viene corretta
+        self.telemetry = telemetry
+        self.landmark_filter = landmark_filter  # Filtro temporale sui landmark (smoothing.OneEuroFilter, ...)
+        self.label_filter = label_filter  # Isteresi sull'etichetta prima della logica dei timer
+
+        self.letter_save_delay = letter_save_delay
+        self.hand_detection_delay = hand_detection_delay
+        self.reset_delay = reset_delay
+        self.space_delay = space_delay
+
+        self.last_letter = ""
+        self.letter_start_time = 0
+        self.current_letter = ""
+        self.hand_open = False
+        self.candidates_dict = {}
+
+        self.letters_committed = 0
+        self.timer_resets = 0  # Timer della lettera ripartito perché l'etichetta è cambiata
+        self._attempt_start = None
+        self._letter_times = []
+        self.reset()
+
+    def reset(self): # Stato azzerato dal gesto di reset (lettera corrente e relativo timer restano)
+        self.saved_letters = []
+        self.hand_detection_start_time = None
+        self.two_hands_start_time = None
+
+        self.space_start_time = None
+        self.waiting_for_space = False
+
+        self.phrase_shown = False
+        self.is_resetting = False
+        self.current_phrase = ""
+        self.detection_started = False
+
+        self.corrected_phrase = ""
+        self.corrections = []
+        self.recognizer.reset()
+
+    def step(self, hand_landmarks_list, timestamp): # Avanza di un frame; restituisce la lista degli eventi generati
+        hands = hand_landmarks_list or []
+        events = []
+        self.current_letter = ""
+        self.hand_open = False
+        recognized = False
+
+        if len(hands) == 2:  # Due mani: gesto di reset
+            if not self.is_resetting:
+                self.two_hands_start_time = timestamp
+                self.is_resetting = True
+
+            elif timestamp - self.two_hands_start_time >= self.reset_delay:
+                self.reset()
+                events.append(_event('reset', timestamp))
+
+        elif len(hands) == 1:
+            self.is_resetting = False
+            self.two_hands_start_time = None
+
+            if not self.current_phrase and not self.detection_started:  # Con una frase già composta bisogna prima resettare
+                if self.hand_detection_start_time is None:
+                    self.hand_detection_start_time = timestamp
+
+                if timestamp - self.hand_detection_start_time >= self.hand_detection_delay:
+                    self.detection_started = True
+                    events.append(_event('detection_started', timestamp))
+
+            if self.detection_started and not self.phrase_shown:
+                self._recognize(_landmarks(hands[0]), timestamp, events)
+                recognized = True
+
+        else:  # Nessuna mano: la parola composta diventa la frase
+            self.is_resetting = False
+            self.two_hands_start_time = None
+
+            if self.detection_started and self.saved_letters and not self.phrase_shown:
+                self.current_phrase = "".join(self.saved_letters)
+                if self.autocorrector is not None:
+                    with self.telemetry.measure('autocorrect'):
+                        self.corrected_phrase, self.corrections, self.candidates_dict = \
+                            self.autocorrector.correct_phrase(self.current_phrase)
+                else:
+                    self.corrected_phrase, self.corrections, self.candidates_dict = self.current_phrase, [], {}
+                self.phrase_shown = True
+                self.detection_started = False
+                self.hand_detection_start_time = None
+
+                events.append(_event('phrase', timestamp, phrase=self.current_phrase,
+                                     corrected=self.corrected_phrase, corrections=self.corrections,
+                                     candidates=self.candidates_dict))
+
+            if not self.detection_started:
+                self.hand_detection_start_time = None
+
+        if not recognized:  # Mano persa o riconoscimento fermo: i filtri ripartono dal prossimo frame
+            self._reset_filters()
+            self._attempt_start = None
+        return events
+
+    def _reset_filters(self):
+        if self.landmark_filter is not None:
+            self.landmark_filter.reset()
+        if self.label_filter is not None:
+            self.label_filter.reset()
+
+    def _recognize(self, landmarks, timestamp, events):
+        with self.telemetry.measure('landmarks'):
+            points = landmarks_to_array(landmarks)
+            if self.landmark_filter is not None:
+                points = self.landmark_filter(points, timestamp)
+        with self.telemetry.measure('recognize'):
+            current_letter, hand_open = self.recognition_cache.recognize(points)
+        if self.label_filter is not None:
+            current_letter, hand_open = self.label_filter((current_letter, hand_open))
+        if self._attempt_start is None:
+            self._attempt_start = timestamp
+        self.current_letter = current_letter
+        self.hand_open = hand_open
+
+        if hand_open:  # Mano aperta tenuta per SPACE_DELAY: spazio
+            if not self.waiting_for_space:
+                self.space_start_time = timestamp
+                self.waiting_for_space = True
+
+            elif timestamp - self.space_start_time >= self.space_delay:
+                if not self.saved_letters or self.saved_letters[-1] != " ":  # Prevengo spazi multipli
+                    self.saved_letters.append(" ")
+                    events.append(_event('space', timestamp))
+
+                self.waiting_for_space = False
+                self.space_start_time = None
+
+        else:
+            self.waiting_for_space = False
+            self.space_start_time = None
+
+            if current_letter != self.last_letter:  # Se la lettera è cambiata si resetta il timer
+                if self.last_letter:
+                    self.timer_resets += 1
+                self.letter_start_time = timestamp
+                self.last_letter = current_letter
+
+            elif current_letter and (timestamp - self.letter_start_time >= self.letter_save_delay):
+                self.saved_letters.append(current_letter)
+                self.letter_start_time = timestamp
+                self.letters_committed += 1
+                self._letter_times.append(timestamp - self._attempt_start)
+                self._attempt_start = timestamp
+                events.append(_event('letter', timestamp, letter=current_letter))
+
+    def metrics(self): # Quanto costa una lettera: ripartenze del timer e secondi di riconoscimento per lettera salvata
+        letters = self.letters_committed
+        return {
+            'letters': letters,
+            'timer_resets': self.timer_resets,
+            'resets_per_letter': round(self.timer_resets / letters, 2) if letters else None,
+            'seconds_per_letter': round(sum(self._letter_times) / letters, 2) if letters else None,
+        }
+
+
+def _landmarks(hand): # Accetta sia NormalizedLandmarkList sia direttamente la lista di landmark o un array (21, 3)
+    return hand.landmark if hasattr(hand, 'landmark') else hand
@@ -0,0 +1,90 @@
+import threading
+import time
+
+# Avvio del tracker: MediaPipe, pyttsx3 e il dizionario di SpellChecker richiedono ciascuno qualche secondo.
+# Vengono creati in parallelo su thread in background mentre l'anteprima della camera è già visibile;
+# chi li usa attende solo se non sono ancora pronti.
+
+
+class Deferred: # Oggetto creato in background: il primo accesso a un suo attributo attende che sia pronto
+
+    def __init__(self, name, factory, on_done=None, fallback=None):
+        self.name = name
+        self.seconds = None  # Durata della creazione, quando è finita
+        self.failure = None  # Errore della creazione, se è stato sostituito dal fallback
+        self._factory = factory
+        self._fallback = fallback  # Factory di un oggetto sostitutivo se la creazione fallisce
+        self._on_done = on_done
+        self._value = None
+        self._error = None
+        self._done = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name=f"avvio-{name}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self._value = self._factory()
+        except Exception as e:
+            if self._fallback is None:
+                self._error = e
+            else:  # L'errore viene segnalato subito, non al primo uso dal ciclo video
+                print(f"{self.name} non disponibile, si continua senza: {e}")
+                self.failure = e
+                self._value = self._fallback()
+        self.seconds = time.perf_counter() - start
+        self._done.set()
+        if self._on_done is not None:
+            self._on_done(self)
+
+    def ready(self):
+        return self._done.is_set()
+
+    def get(self, timeout=None): # L'oggetto creato; un errore nella creazione viene rilanciato qui
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} non è ancora pronto")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class Startup: # Tempi delle fasi di avvio, dall'avvio del processo
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}  # fase -> (secondi dall'avvio a fine fase, durata)
+        self._deferred = []
+        self._lock = threading.Lock()
+
+    def _record(self, name, seconds):
+        with self._lock:
+            self.phases[name] = (time.perf_counter() - self.start, seconds)
+
+    def background(self, name, factory, fallback=None): # Avvia subito la creazione su un thread, restituisce un Deferred
+        deferred = Deferred(name, factory, on_done=lambda item: self._record(item.name, item.seconds), fallback=fallback)
+        self._deferred.append(deferred)
+        return deferred
+
+    def measure(self, name, factory): # Fase eseguita nel thread principale
+        start = time.perf_counter()
+        value = factory()
+        self._record(name, time.perf_counter() - start)
+        return value
+
+    def mark(self, name): # Istante notevole, ad esempio il primo frame mostrato
+        self._record(name, 0.0)
+
+    def done(self):
+        return all(deferred.ready() for deferred in self._deferred)
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1][0])
+        return "Avvio: " + ", ".join(
+            f"{name} {seconds:.2f} s (a {elapsed:.2f} s)" if seconds else f"{name} a {elapsed:.2f} s"
+            for name, (elapsed, seconds) in phases)
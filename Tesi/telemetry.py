@@ -0,0 +1,170 @@
+import os
+import time
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Measure: # Context manager riusato per ogni stadio: nessuna allocazione per frame
+    __slots__ = ('_telemetry', '_stage', '_start')
+
+    def __init__(self, telemetry, stage):
+        self._telemetry = telemetry
+        self._stage = stage
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._telemetry.record(self._stage, time.perf_counter() - self._start)
+        return False
+
+
+class _NullMeasure:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Telemetry: # Tempi per stadio del ciclo di tracking in finestre scorrevoli, con percentili ed esportazione periodica
+
+    def __init__(self, window=1024, export_path=None, export_interval=10.0):
+        self.window = window  # Campioni tenuti per ogni stadio
+        self.export_path = export_path  # .csv (righe aggiunte) oppure .prom (file di testo per Prometheus)
+        self.export_interval = export_interval
+
+        self._samples = {}  # stadio -> lista circolare di durate in secondi
+        self._positions = {}
+        self._counts = {}
+        self._sums = {}
+        self._measures = {}
+        self._ticks = []
+        self._last_export = time.time()
+        self._summary = None
+        self._summary_time = 0.0
+
+    def measure(self, stage): # with telemetry.measure('inference'): ...
+        measure = self._measures.get(stage)
+        if measure is None:
+            measure = self._measures[stage] = _Measure(self, stage)
+        return measure
+
+    def record(self, stage, seconds):
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = []
+            self._positions[stage] = 0
+            self._counts[stage] = 0
+            self._sums[stage] = 0.0
+
+        if len(samples) < self.window:
+            samples.append(seconds)
+        else:
+            position = self._positions[stage]
+            samples[position] = seconds
+            self._positions[stage] = (position + 1) % self.window
+        self._counts[stage] += 1
+        self._sums[stage] += seconds
+
+    def tick(self): # Un frame completato: serve per gli fps e per il tempo totale del ciclo
+        now = time.perf_counter()
+        if self._ticks:
+            self.record('loop', now - self._ticks[-1])
+        self._ticks.append(now)
+        if len(self._ticks) > 120:
+            del self._ticks[:-120]
+
+    def fps(self):
+        if len(self._ticks) < 2:
+            return 0.0
+        return (len(self._ticks) - 1) / (self._ticks[-1] - self._ticks[0])
+
+    def summary(self): # stadio -> conteggio, media e percentili in millisecondi sulla finestra
+        summary = {}
+        for stage, samples in self._samples.items():
+            values = np.array(samples) * 1000.0
+            p50, p95, p99 = np.quantile(values, QUANTILES)
+            summary[stage] = {
+                'count': self._counts[stage],
+                'mean': float(values.mean()),
+                'p50': float(p50),
+                'p95': float(p95),
+                'p99': float(p99),
+            }
+        return summary
+
+    def cached_summary(self, max_age=1.0): # Per la visualizzazione a schermo: ricalcolo i percentili al più una volta al secondo
+        now = time.perf_counter()
+        if self._summary is None or now - self._summary_time >= max_age:
+            self._summary = self.summary()
+            self._summary_time = now
+        return self._summary
+
+    def maybe_export(self): # Da chiamare a ogni frame: esporta solo allo scadere dell'intervallo
+        if self.export_path and time.time() - self._last_export >= self.export_interval:
+            self.export()
+
+    def export(self):
+        self._last_export = time.time()
+        if self.export_path.endswith('.prom'):
+            self.export_prometheus(self.export_path)
+        else:
+            self.export_csv(self.export_path)
+
+    def export_csv(self, path): # Una riga per stadio a ogni esportazione
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', encoding='utf-8') as file:
+            if new_file:
+                file.write('timestamp,stage,count,mean_ms,p50_ms,p95_ms,p99_ms,fps\n')
+            fps = self.fps()
+            for stage, values in self.summary().items():
+                file.write(f"{self._last_export:.3f},{stage},{values['count']},{values['mean']:.3f},"
+                           f"{values['p50']:.3f},{values['p95']:.3f},{values['p99']:.3f},{fps:.1f}\n")
+
+    def export_prometheus(self, path): # Formato testuale di Prometheus, sostituito in modo atomico (node_exporter textfile)
+        lines = [
+            '# HELP lis_stage_latency_seconds Durata degli stadi del ciclo di tracking',
+            '# TYPE lis_stage_latency_seconds summary',
+        ]
+        for stage, values in self.summary().items():
+            for quantile in QUANTILES:
+                key = f"p{int(round(quantile * 100))}"
+                lines.append(f'lis_stage_latency_seconds{{stage="{stage}",quantile="{quantile}"}} {values[key] / 1000.0:.6f}')
+            lines.append(f'lis_stage_latency_seconds_sum{{stage="{stage}"}} {self._sums[stage]:.6f}')
+            lines.append(f'lis_stage_latency_seconds_count{{stage="{stage}"}} {values["count"]}')
+        lines += [
+            '# HELP lis_frames_per_second Frame elaborati al secondo',
+            '# TYPE lis_frames_per_second gauge',
+            f'lis_frames_per_second {self.fps():.2f}',
+        ]
+
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(temporary, path)
+
+
+class NullTelemetry(Telemetry): # Telemetria disattivata: stessi metodi, nessuna misura
+    _null_measure = _NullMeasure()
+
+    def measure(self, stage):
+        return self._null_measure
+
+    def record(self, stage, seconds):
+        pass
+
+    def tick(self):
+        pass
+
+    def maybe_export(self):
+        pass
+
+
+NULL_TELEMETRY = NullTelemetry()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from landmark_geometry import LETTER_ENGINE, LETTER_RULES, HandFeatures, LetterRecognizer, rules_exclusive
+
+
+def random_poses(count, seed=0): # Pose casuali nel riquadro centrale dell'immagine: circa il 7% è una lettera
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0.3, 0.7, size=(count, 21, 3))
+
+
+def held_sequence(poses, seed=1): # Ogni pose tenuta per qualche frame con un po' di rumore, come una lettera ferma davanti alla camera
+    rng = np.random.default_rng(seed)
+    for pose in poses:
+        for _ in range(rng.integers(1, 6)):
+            yield pose + rng.normal(0.0, 0.002, size=pose.shape)
+
+
+def test_recognizer_matches_classify_on_random_poses():
+    poses = random_poses(20000)
+    recognizer = LetterRecognizer()
+    for pose in held_sequence(poses):
+        assert recognizer.recognize(pose) == LETTER_ENGINE.classify(HandFeatures(pose))
+    assert recognizer.fast_path_hits > 0
+
+
+def test_recognizer_after_lower_priority_letter():
+    # Dopo una lettera poco prioritaria, un frame che soddisfa anche una rivale più prioritaria deve dare la rivale
+    poses = random_poses(4000, seed=2)
+    labels = [LETTER_ENGINE.classify(HandFeatures(pose)) for pose in poses]
+    recognizer = LetterRecognizer()
+    for pose, label in zip(poses, labels):
+        for previous in LETTER_ENGINE.letters:
+            recognizer.last_letter = previous
+            assert recognizer.recognize(pose) == label
+
+
+def test_exclusive_rules_never_match_together():
+    features = [HandFeatures(pose) for pose in random_poses(20000, seed=3)]
+    matched = {letter: {i for i, feature in enumerate(features) if LETTER_ENGINE.matches(letter, feature)}
+               for letter in LETTER_ENGINE.letters}
+    for a in LETTER_ENGINE.letters:
+        for b in LETTER_ENGINE.letters:
+            if a < b and rules_exclusive(LETTER_RULES[a], LETTER_RULES[b]):
+                assert not matched[a] & matched[b], (a, b)
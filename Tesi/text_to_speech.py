@@ -1,59 +1,446 @@
-import pyttsx3
 import threading
-import queue
+import time
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import wave
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, wait
+
+import numpy as np
+
+from speech_backend import create_speech_backend
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXY"  # Le lettere riconosciute dalle regole (la Z è un movimento)
+SPACE_WORD = "spazio"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'lis_tracker', 'voce')
+WARMUP_PHRASES = ["Ha composto:", "Forse intendeva:"]  # Prefissi fissi delle frasi lette dal tracker
+
+PHRASE_PRIORITY = 0
+LETTER_PRIORITY = 1
+
+
+class AudioClip: # Audio PCM già sintetizzato, tenuto in memoria
+    def __init__(self, path, text=None):
+        self.path = path  # Per i lettori da riga di comando
+        self.text = text  # Da sintetizzare se la riproduzione non funziona
+        with open(path, 'rb') as file:
+            self.wav = file.read()  # File completo, per winsound
+        with wave.open(path, 'rb') as reader:
+            self.channels = reader.getnchannels()
+            self.sample_width = reader.getsampwidth()
+            self.rate = reader.getframerate()
+            self.frames = reader.readframes(reader.getnframes())  # Solo i campioni, per simpleaudio
+
+
+class Pause: # Silenzio tra due frasi, nella coda della voce invece che nel ciclo video
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+
+class SimpleAudioSink: # Riproduzione dei campioni dalla memoria con simpleaudio
+    def __init__(self, simpleaudio):
+        self.simpleaudio = simpleaudio
+        self._playing = None
+
+    def play(self, clip):
+        self._playing = self.simpleaudio.play_buffer(clip.frames, clip.channels, clip.sample_width, clip.rate)
+        self._playing.wait_done()
+
+    def stop(self):
+        playing = self._playing
+        if playing is not None:
+            playing.stop()
+
+
+class WinsoundSink: # Su Windows il modulo standard winsound riproduce un WAV dalla memoria
+    def __init__(self, winsound):
+        self.winsound = winsound
+
+    def play(self, clip):
+        self.winsound.PlaySound(clip.wav, self.winsound.SND_MEMORY)
+
+    def stop(self): # PlaySound sincrono non si può interrompere: si annulla solo la coda
+        pass
+
+
+class PlayerSink: # Senza simpleaudio il file WAV viene riprodotto da un lettore da riga di comando (paplay, aplay, afplay)
+    def __init__(self, command):
+        self.command = command
+        self._playing = None
+
+    def play(self, clip):
+        self._playing = subprocess.Popen([*self.command, clip.path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if self._playing.wait() > 0:  # Codice negativo: interrotto da stop
+            raise RuntimeError(f"{self.command[0]} non riesce a riprodurre {clip.path}")
+
+    def stop(self):
+        playing = self._playing
+        if playing is not None and playing.poll() is None:
+            playing.terminate()
+
+
+class SpeechScheduler: # Coda della voce con priorità: le frasi passano avanti alle lettere, le lettere vecchie vengono scartate
+
+    def __init__(self, max_letter_age=1.0, max_pending_letters=1):
+        self.max_letter_age = max_letter_age  # Secondi oltre i quali una lettera non ancora detta non serve più
+        self.max_pending_letters = max_pending_letters  # Lettere in attesa: arrivandone una nuova si scartano le più vecchie
+
+        self._condition = threading.Condition()
+        self._phrases = deque()  # (istante di accodamento, elemento)
+        self._letters = deque()
+        self._closed = False
+
+        self.letters_dropped = 0
+        self.cancelled = 0
+        self.max_depth = 0
+        self._latencies = deque(maxlen=200)  # Dall'accodamento all'inizio della riproduzione
+
+    def put(self, item, priority=PHRASE_PRIORITY):
+        with self._condition:
+            now = time.perf_counter()
+            if priority == PHRASE_PRIORITY:
+                self.letters_dropped += len(self._letters)  # La frase riassume le lettere ancora in attesa
+                self._letters.clear()
+                self._phrases.append((now, item))
+            else:
+                self._letters.append((now, item))
+                while len(self._letters) > self.max_pending_letters:
+                    self._letters.popleft()
+                    self.letters_dropped += 1
+            self.max_depth = max(self.max_depth, len(self._phrases) + len(self._letters))
+            self._condition.notify()
+
+    def get(self, timeout=None): # Prossimo elemento da dire; None allo scadere del timeout o alla chiusura
+        with self._condition:
+            while True:
+                if self._phrases:
+                    queued, item = self._phrases.popleft()
+                    break
+
+                now = time.perf_counter()
+                while self._letters and now - self._letters[0][0] > self.max_letter_age:
+                    self._letters.popleft()
+                    self.letters_dropped += 1
+                if self._letters:
+                    queued, item = self._letters.popleft()
+                    break
+
+                if self._closed or not self._condition.wait(timeout):
+                    return None
+
+            self._latencies.append(time.perf_counter() - queued)
+            return item
+
+    def cancel(self): # Svuota la coda (gesto di reset)
+        with self._condition:
+            self.cancelled += len(self._phrases) + len(self._letters)
+            self._phrases.clear()
+            self._letters.clear()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def depth(self):
+        with self._condition:
+            return len(self._phrases) + len(self._letters)
+
+    def stats(self):
+        latencies = np.array(self._latencies) * 1000.0 if self._latencies else np.zeros(1)
+        return {
+            'depth': self.depth(),
+            'max_depth': self.max_depth,
+            'letters_dropped': self.letters_dropped,
+            'cancelled': self.cancelled,
+            'latency_ms': round(float(latencies.mean()), 1),
+            'latency_p95_ms': round(float(np.percentile(latencies, 95)), 1),
+        }
+
+
+class PhraseCache: # Cache LRU su disco delle frasi sintetizzate, indicizzata su (testo, voce, velocità)
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        # Dal meno recente al più recente: l'ordine sopravvive ai riavvii tramite la data di modifica dei file
+        self._entries = OrderedDict()  # chiave -> dimensione in byte
+        files = [entry for entry in os.scandir(directory) if entry.name.endswith('.wav')]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self._entries[entry.name[:-4]] = entry.stat().st_size
+        self.size = sum(self._entries.values())
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._evict()
+
+    @staticmethod
+    def key(text, voice, rate):
+        return hashlib.sha1(f"{text}\0{voice}\0{rate}".encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key): # AudioClip della frase, None se non è in cache
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            clip = AudioClip(self.path(key))
+            os.utime(self.path(key))
+        except (OSError, EOFError, wave.Error):  # File rimosso o danneggiato
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return clip
+
+    def add(self, key, rendered_path): # Sposta in cache un file appena sintetizzato
+        os.replace(rendered_path, self.path(key))
+        if key in self._entries:
+            self.size -= self._entries.pop(key)
+        self._entries[key] = os.path.getsize(self.path(key))
+        self.size += self._entries[key]
+        self._evict()
+
+    def _remove(self, key):
+        self.size -= self._entries.pop(key)
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+PLAYER_COMMANDS = [('paplay',), ('aplay', '-q'), ('afplay',)]
+
+
+def create_audio_sink(): # None se non c'è modo di riprodurre audio già sintetizzato: si torna alla sintesi a ogni lettera
+    try:
+        import simpleaudio
+        return SimpleAudioSink(simpleaudio)
+    except ImportError:
+        pass
+    if sys.platform == 'win32':
+        import winsound
+        return WinsoundSink(winsound)
+    for command in PLAYER_COMMANDS:
+        if shutil.which(command[0]):
+            return PlayerSink(command)
+    return None
+
 
 class SpeechSynthesizer:
-    def __init__(self):
-       
-        self.engine = pyttsx3.init()  # Inizializzazione del motore di sintesi vocale
-        
-        try: # Impostazione della voce in italiano se disponibile
-            voices = self.engine.getProperty('voices')
-            italian_voice = next((voice for voice in voices if 'italian' in voice.languages), None)
-            if italian_voice:
-                self.engine.setProperty('voice', italian_voice.id)
-        except:
-            pass  
-        
-        self.engine.setProperty('rate', 200) # Da qua posso impostare la velocità del parlato
-        self.speech_queue = queue.Queue()
-        
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, sink=None, max_cache_bytes=64 * 1024 * 1024, warmup_phrases=(),
+                 backend=None):
+
+        # Il motore di sintesi gira in un processo separato (speech_backend), la voce italiana è scelta lì
+        self.backend = backend or create_speech_backend('pyttsx3', rate=200)
+        self.voice = tuple(self.backend.voice().result())  # (voce, velocità): chiave delle cache audio
+
+        # Lettere e "spazio" sintetizzati una volta sola su file e poi riprodotti dalla memoria
+        self.sink = sink or create_audio_sink()
+        if self.sink is None:
+            print("Nessun modo di riprodurre l'audio sintetizzato (simpleaudio, paplay, aplay o afplay): "
+                  "lettere e frasi vengono sintetizzate ogni volta")
+        self.clips = self._load_clips(cache_dir) if self.sink is not None and cache_dir else {}
+        self.clips_played = 0
+        self.phrases_synthesized = 0
+
+        # Le frasi già dette si riproducono dalla cache su disco; le nuove vengono salvate quando la coda è vuota
+        self.phrase_cache = None
+        if self.sink is not None and cache_dir:
+            self.phrase_cache = PhraseCache(os.path.join(cache_dir, 'frasi'), max_cache_bytes)
+        self._to_render = deque()
+        self.warm_up(WARMUP_PHRASES + list(warmup_phrases))
+
+        self.scheduler = SpeechScheduler()
+
         self.is_running = True
-        
+
         self.speech_thread = threading.Thread(target=self._process_speech_queue)
         self.speech_thread.daemon = True
         self.speech_thread.start()  # Avvio del thread per la gestione della sintesi vocale
 
+    def _load_clips(self, cache_dir): # Cartella per voce e velocità: cambiando voce si risintetizza tutto
+        try:
+            key = "{}|{}".format(*self.voice)
+            directory = os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest()[:12])
+            os.makedirs(directory, exist_ok=True)
+
+            paths = {word: os.path.join(directory, f"{word}.wav") for word in list(LETTERS) + [SPACE_WORD]}
+            missing = [word for word, path in paths.items() if not os.path.exists(path)]
+            wait([self.backend.render(word.lower(), paths[word]) for word in missing])
+        except Exception as e:
+            print(f"Errore nella preparazione dell'audio delle lettere: {e}")
+            return {}
+
+        clips = {}
+        for word, path in paths.items():
+            try:
+                clips[word] = AudioClip(path, word)
+            except (OSError, EOFError, wave.Error):  # File incompleto o non WAV: la lettera verrà sintetizzata
+                if os.path.exists(path):
+                    os.remove(path)
+        return clips
+
     def _process_speech_queue(self): #Thread worker che processa la coda dei messaggi da pronunciare
-        
+
         while self.is_running:
+            # Attendo un nuovo messaggio senza polling; il timeout serve solo se ci sono frasi da salvare in cache
+            item = self.scheduler.get(timeout=0.1 if self._to_render else None)
             try:
-                # Attendo un nuovo messaggio dalla coda
-                text = self.speech_queue.get(timeout=0.1)
-                if text:
-                    self.engine.say(text)
-                    self.engine.runAndWait()
-                self.speech_queue.task_done()
-            except queue.Empty:
-                continue
+                if item is None:
+                    if self._to_render and self.is_running:  # Nessun messaggio in attesa: salvo in cache una frase nuova
+                        self._render(self._to_render.popleft())
+                elif isinstance(item, AudioClip):
+                    self._play(item, item.text)
+                elif isinstance(item, Pause):
+                    time.sleep(item.seconds)
+                else:
+                    self._speak_text(item)
+            except CancelledError:  # Frase interrotta dal gesto di reset
+                pass
             except Exception as e:
                 print(f"Errore durante la sintesi vocale: {e}")
 
+    def _speak_text(self, text):
+        if self.phrase_cache is not None:
+            clip = self.phrase_cache.get(PhraseCache.key(text, *self.voice))
+            if clip is not None:
+                self._play(clip, text)
+                return
+            self._to_render.append(text)
+
+        self.backend.speak(text).result()
+        self.phrases_synthesized += 1
+
+    def _play(self, clip, text): # Se il lettore non riesce a riprodurre il clip (niente server audio, lettore mancante) si torna alla sintesi
+        sink = self.sink
+        if sink is not None:
+            try:
+                sink.play(clip)
+                self.clips_played += 1
+                return
+            except Exception as e:
+                print(f"Riproduzione dell'audio sintetizzato non riuscita ({e}): "
+                      "lettere e frasi vengono sintetizzate ogni volta")
+                self._disable_sink()
+
+        self.backend.speak(text).result()
+        self.phrases_synthesized += 1
+
+    def _disable_sink(self): # Come senza lettore: niente clip delle lettere né cache delle frasi
+        self.sink = None
+        self.clips = {}
+        self.phrase_cache = None
+        self._to_render.clear()
+
+    def _render(self, text): # Sintesi su file quando la voce è libera, così non ritarda i messaggi in coda
+        if self.phrase_cache is None:  # Lettore disattivato dopo un errore
+            return
+        key = PhraseCache.key(text, *self.voice)
+        if key in self.phrase_cache:
+            return
+        rendering = self.phrase_cache.path(key) + '.tmp'
+        try:
+            self.backend.render(text, rendering).result()
+            AudioClip(rendering)  # Verifico che sia un WAV leggibile prima di metterlo in cache
+            self.phrase_cache.add(key, rendering)
+        except Exception as e:
+            print(f"Errore nel salvataggio della frase in cache: {e}")
+            if os.path.exists(rendering):
+                os.remove(rendering)
+
+    def warm_up(self, phrases): # Frasi da sintetizzare in anticipo, appena la voce è libera
+        if self.phrase_cache is not None:
+            self._to_render.extend(phrase for phrase in phrases
+                                   if phrase.strip() and PhraseCache.key(phrase, *self.voice) not in self.phrase_cache)
+
     def speak_letter(self, letter):
-        if letter == " ":
-            self.speech_queue.put("spazio")
-        else:
-            self.speech_queue.put(letter)
+        word = SPACE_WORD if letter == " " else letter
+        self.scheduler.put(self.clips.get(word, word), LETTER_PRIORITY)
 
     def speak_phrase(self, phrase):
         if phrase and not phrase.isspace():
-            self.speech_queue.put(phrase)
+            self.scheduler.put(phrase, PHRASE_PRIORITY)
+
+    def pause(self, seconds):
+        self.scheduler.put(Pause(seconds), PHRASE_PRIORITY)
+
+    def cancel(self): # Annulla tutto ciò che è in attesa e interrompe ciò che si sta dicendo
+        self.scheduler.cancel()
+        sink = self.sink
+        if sink is not None:
+            sink.stop()
+        self.backend.interrupt()
+
+    def stats(self):
+        return {
+            'sink': type(self.sink).__name__ if self.sink is not None else None,
+            'clips': len(self.clips),
+            'clips_played': self.clips_played,
+            'synthesized': self.phrases_synthesized,
+            'phrase_cache': self.phrase_cache.stats() if self.phrase_cache is not None else None,
+            'queue': self.scheduler.stats(),
+            'backend': self.backend.stats(),
+        }
 
     def cleanup(self): # Pulizia delle risorse
         self.is_running = False
+        self.scheduler.close()
         if self.speech_thread.is_alive():
             self.speech_thread.join()
-        self.engine.stop()
+        self.backend.close()
+
+class NullSynthesizer: # Stessa interfaccia di SpeechSynthesizer senza voce, se il motore di sintesi non si avvia
+
+    def speak_letter(self, letter):
+        pass
+
+    def speak_phrase(self, phrase):
+        pass
+
+    def pause(self, seconds):
+        pass
+
+    def warm_up(self, phrases):
+        pass
+
+    def cancel(self):
+        pass
+
+    def stats(self):
+        return {}
+
+    def cleanup(self):
+        pass
 
-def create_synthesizer(): #Factory function per creare un'istanza del sintetizzatore 
-    return SpeechSynthesizer()
\ No newline at end of file
+def create_synthesizer(warmup_phrases=(), backend='pyttsx3'): #Factory function per creare un'istanza del sintetizzatore
+    return SpeechSynthesizer(warmup_phrases=warmup_phrases, backend=create_speech_backend(backend))
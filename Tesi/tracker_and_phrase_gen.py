@@ -1,241 +1,319 @@
+import argparse
+import importlib
 import cv2
-import mediapipe as mp
-from landmark_geometry import recognize_letter
-import time
-from text_to_speech import create_synthesizer
-from autocorrection import create_autocorrector
+from landmark_geometry import LetterRecognizer, QUANTIZATION_STEP, RECOGNITION_CACHE_SIZE, THUMB_TIP, WRIST
+from prototype_classifier import PrototypeClassifier
+from text_to_speech import NullSynthesizer, create_synthesizer
+from speech_backend import BACKEND_CHOICES
+from capture import create_capture
+from pipeline import HandsPipeline, create_hands, local_frames
+from hand_roi import RegionOfInterest
+from governor import InferenceGovernor
+from autocorrection import NullAutoCorrector, create_autocorrector
+from landmark_recording import LandmarkRecorder
+from overlay import TextOverlay
+from telemetry import NULL_TELEMETRY, Telemetry
+from smoothing import SMOOTHING_CHOICES, create_filters
+from startup import Startup
+from spelling_session import SpellingSession, HAND_DETECTION_DELAY, LETTER_SAVE_DELAY, RESET_DELAY, SPACE_DELAY
 
 def is_right_hand(landmarks, mirrored=True):
     if mirrored:
-        return landmarks[mp_hands.HandLandmark.THUMB_TIP].x < landmarks[mp_hands.HandLandmark.WRIST].x
+        return landmarks[THUMB_TIP].x < landmarks[WRIST].x
     else:
-        return landmarks[mp_hands.HandLandmark.THUMB_TIP].x > landmarks[mp_hands.HandLandmark.WRIST].x
-
-
-# Così controllo e inserisco lo spazio 
-def is_hand_open(landmarks_dict):
-    tips = [mp_hands.HandLandmark.INDEX_FINGER_TIP, mp_hands.HandLandmark.MIDDLE_FINGER_TIP, 
-            mp_hands.HandLandmark.RING_FINGER_TIP, mp_hands.HandLandmark.PINKY_TIP]
-    mcps = [mp_hands.HandLandmark.INDEX_FINGER_MCP, mp_hands.HandLandmark.MIDDLE_FINGER_MCP,
-            mp_hands.HandLandmark.RING_FINGER_MCP, mp_hands.HandLandmark.PINKY_MCP]
-    
-    fingers_up = all(landmarks_dict[tip].y < landmarks_dict[mcp].y - 0.1 for tip, mcp in zip(tips, mcps))
-    fingers_spread = all(abs(landmarks_dict[tips[i]].x - landmarks_dict[tips[i+1]].x) > 0.04 for i in range(len(tips)-1))
-    thumb_up = landmarks_dict[mp_hands.HandLandmark.THUMB_TIP].y < landmarks_dict[mp_hands.HandLandmark.THUMB_MCP].y
-    
-    return fingers_up and fingers_spread and thumb_up
-
-
-# Inizializzazione MediaPipe Hands
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.7)
-mp_drawing = mp.solutions.drawing_utils
-
-last_letter = ""
-letter_start_time = 0
-saved_letters = []
-hand_detection_start_time = None
-two_hands_start_time = None
-
-space_start_time = None
-waiting_for_space = False
-
-LETTER_SAVE_DELAY = 1.5  
-HAND_DETECTION_DELAY = 1.5
-RESET_DELAY = 2
-SPACE_DELAY = 1.2  
-
-phrase_shown = False  
-is_resetting = False  
-current_phrase = ""  
-detection_started = False  
-
-corrected_phrase = ""  # Nuova variabile per la frase corretta
-corrections = []      # Lista per le correzioni
-
-candidates_dict = {}     
+        return landmarks[THUMB_TIP].x > landmarks[WRIST].x
+
+
+HANDS_OPTIONS = dict(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.7)
+
 MAX_CANDIDATES_SHOWN = 5 
 
-capture = cv2.VideoCapture(0)
-capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  
-capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-
-synthesizer = create_synthesizer()
-autocorrector = create_autocorrector() 
-
-while capture.isOpened():
-    success, image = capture.read()
-    if not success:
-        print("Ignoring empty camera frame.")
-        break
-    
-    # Conversione dell'immagine in RGB
-    image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-    image.flags.writeable = False
-    results = hands.process(image)
-    image.flags.writeable = True
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-    current_time = time.time()
-    
-   
-    if results.multi_hand_landmarks and len(results.multi_hand_landmarks) == 2:  # Controllo se ci sono due mani (per il reset)
-        if not is_resetting: 
-            two_hands_start_time = current_time
-            is_resetting = True
-        
-        elif current_time - two_hands_start_time >= RESET_DELAY: #Reset completo
-            
-            saved_letters = []
-            current_phrase = ""
-            phrase_shown = False
-            is_resetting = False
-            corrected_phrase = ""  # Reset della frase corretta
-            corrections = []       # Reset delle correzioni
-            
-            two_hands_start_time = None
-            detection_started = False
-            hand_detection_start_time = None
-            
-
-            space_start_time = None
-            waiting_for_space = False
-        
-        else: #Parte il countdown per il reset
-            time_left = RESET_DELAY - (current_time - two_hands_start_time)
+
+def speak_events(synthesizer, events, pending): # La sintesi vocale reagisce agli eventi della sessione
+    # Finché la voce si sta avviando il ciclo video non la aspetta: le lettere vengono saltate,
+    # le frasi messe da parte in pending e lette appena la voce è pronta
+    if not synthesizer.ready():
+        for event in events:
+            if event['type'] == 'reset':
+                pending.clear()
+            elif event['type'] == 'phrase':
+                pending.append(event)
+        return
+    if pending:
+        events = pending + events
+        pending.clear()
+
+    for event in events:
+        if event['type'] == 'letter':
+            synthesizer.speak_letter(event['letter'])
+
+        elif event['type'] == 'reset':  # La frase è stata cancellata: non serve più leggerla
+            synthesizer.cancel()
+
+        elif event['type'] == 'phrase':
+            if event['corrections']:  # I prefissi fissi sono frasi a sé: restano nella cache della sintesi vocale
+                synthesizer.speak_phrase("Ha composto:")
+                synthesizer.speak_phrase(event['phrase'])
+                synthesizer.pause(0.3)  # Piccola pausa tra le frasi, senza fermare il ciclo video
+                synthesizer.speak_phrase("Forse intendeva:")
+                synthesizer.speak_phrase(event['corrected'])
+            else:
+                synthesizer.speak_phrase(event['phrase'])
+
+
+def draw_hand(image, hand_landmarks): # mediapipe viene importato in background all'avvio, anche con --workers: qui è già caricato
+    import mediapipe as mp
+    mp.solutions.drawing_utils.draw_landmarks(image, hand_landmarks, mp.solutions.hands.HAND_CONNECTIONS)
+
+
+def show_preview(capture, startup, pending, overlay): # Anteprima della camera finché MediaPipe non è pronto; False se si preme ESC
+    while not all(deferred.ready() for deferred in pending):
+        success, frame, _ = capture.read(timeout=0.1)
+        if not success:
+            if not capture.isOpened():
+                return True
+            continue
+        if 'primo frame' not in startup.phases:
+            startup.mark('primo frame')
+
+        image = cv2.flip(frame, 1)
+        overlay.text(image, "Caricamento in corso...", (10, 50), 1, (255, 255, 255))
+        cv2.imshow('Riconoscimento LIS MediaPipe', image)
+        if cv2.waitKey(5) & 0xFF == 27:
+            return False
+    return True
+
+
+def draw_phrases(image, overlay, session, y_phrase, y_corrected):
+    overlay.text(image, f"Frase Composta: {session.current_phrase}", (10, y_phrase), 1, (255, 255, 255))
+
+    if session.corrected_phrase and session.corrected_phrase != session.current_phrase:
+        overlay.text(image, f"Frase Corretta: {session.corrected_phrase}", (10, y_corrected), 1, (0, 255, 0))
+        return True
+    return False
+
+
+def draw_telemetry(image, overlay, telemetry): # Tempi per stadio in basso a sinistra; i percentili si aggiornano una volta al secondo
+    summary = telemetry.cached_summary()
+    lines = [f"{telemetry.fps():.0f} fps"] + [
+        f"{stage}: {values['p50']:.1f} / {values['p95']:.1f} / {values['p99']:.1f} ms" for stage, values in summary.items()]
+    y = image.shape[0] - 20 - 25 * (len(lines) - 1)
+    for line in lines[1:]:
+        overlay.text(image, line, (10, y), 0.6, (0, 255, 255), 1)
+        y += 25
+    cv2.putText(image, lines[0], (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 1, cv2.LINE_AA)
+
+
+def draw_session(image, overlay, session, hand_landmarks_list, current_time): # Disegno lo stato della sessione: solo i countdown con putText a ogni frame
+    hands_count = len(hand_landmarks_list or [])
+
+    if hands_count == 2:  # Countdown per il reset
+        if session.is_resetting:
+            time_left = RESET_DELAY - (current_time - session.two_hands_start_time)
             cv2.putText(image, f"Reset in: {time_left:.1f}s", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-        
-        if current_phrase:  
-            cv2.putText(image, f"Frase Composta: {current_phrase}", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-            
-            if corrected_phrase and corrected_phrase != current_phrase:
-                cv2.putText(image, f"Frase Corretta: {corrected_phrase}", (10, 210), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-            
-    
-    elif results.multi_hand_landmarks and len(results.multi_hand_landmarks) == 1:  #Se c'è una mano
-        is_resetting = False
-        two_hands_start_time = None
-
-        if current_phrase and not is_resetting:
-            cv2.putText(image, "Prima di iniziare il riconoscimento bisogna resettare la frase precedente", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-        else:
 
-            if not detection_started:
-                if hand_detection_start_time is None:
-                    hand_detection_start_time = current_time
-                
-                time_left = HAND_DETECTION_DELAY - (current_time - hand_detection_start_time)
-                
-                if time_left > 0:
-                    cv2.putText(image, f"Inizio riconoscimento in: {time_left:.1f}s", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA) # Mostro il countdown per l'inizio del riconoscimento
-                else:
-                    detection_started = True
-                    
-        if detection_started and not phrase_shown:
-            hand_landmarks = results.multi_hand_landmarks[0]
-            mp_drawing.draw_landmarks(image, hand_landmarks, mp_hands.HAND_CONNECTIONS) #Disegno dei landmark della mano
-            landmarks_dict = {l: hand_landmarks.landmark[l.value] for l in mp_hands.HandLandmark}
-            
-            
-            
-            # Controllo se la mano è aperta per inserire uno spazio
-            if is_hand_open(landmarks_dict):
-                
-                if not waiting_for_space:
-                    space_start_time = current_time
-                    waiting_for_space = True
-                
-                elif current_time - space_start_time >= SPACE_DELAY:
-                    
-                    if not saved_letters or saved_letters[-1] != " ":  # Prevengo spazi multipli
-                        saved_letters.append(" ")
-                    
-                    waiting_for_space = False
-                    space_start_time = None
-                
-                else:
-                    time_left = SPACE_DELAY - (current_time - space_start_time)
+        if session.current_phrase:
+            draw_phrases(image, overlay, session, 150, 210)
+
+    elif hands_count == 1:
+        if session.current_phrase:
+            overlay.text(image, "Prima di iniziare il riconoscimento bisogna resettare la frase precedente", (10, 50), 1, (0, 0, 255))
+
+        elif not session.detection_started and session.hand_detection_start_time is not None:
+            time_left = HAND_DETECTION_DELAY - (current_time - session.hand_detection_start_time)
+            cv2.putText(image, f"Inizio riconoscimento in: {time_left:.1f}s", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA) # Mostro il countdown per l'inizio del riconoscimento
+
+        if session.detection_started and not session.phrase_shown:
+            draw_hand(image, hand_landmarks_list[0]) #Disegno dei landmark della mano
+
+            if session.hand_open:
+                if session.waiting_for_space:
+                    time_left = SPACE_DELAY - (current_time - session.space_start_time)
                     cv2.putText(image, f"Spazio in: {time_left:.1f}s", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-            
-            else:
-                waiting_for_space = False
-                space_start_time = None
-                current_letter = recognize_letter(landmarks_dict)
-                
-                if current_letter != last_letter:  #Se la lettera è cambiata si resetta il timer
-                    letter_start_time = current_time
-                    last_letter = current_letter
-                
-                elif current_letter and (current_time - letter_start_time >= LETTER_SAVE_DELAY):
-                        saved_letters.append(current_letter)
-                        synthesizer.speak_letter(current_letter) 
-                        letter_start_time = current_time
-                
-                if current_letter:
-                    time_left = max(0, LETTER_SAVE_DELAY - (current_time - letter_start_time))
-                    
-                    cv2.putText(image, f"Lettera: {current_letter} ({time_left:.1f}s)", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-                    
-                    cv2.putText(image, f"Lettere Salvate: {''.join(saved_letters)}", (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-        
-        
-        if current_phrase:  # Visualizzazione frasi
-            cv2.putText(image, f"Frase Composta: {current_phrase}", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-            
-            if corrected_phrase and corrected_phrase != current_phrase:
-                cv2.putText(image, f"Frase Corretta: {corrected_phrase}", (10, 210), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-    
-    else:  #Se non ci sono mani
-        is_resetting = False
-        two_hands_start_time = None
-        
-        if detection_started and saved_letters and not phrase_shown:  #Salvo e mostro la lettera composta
-                current_phrase = "".join(saved_letters)
-                
-                # Applico l'autocorrezione
-                corrected_phrase, corrections, candidates_dict = autocorrector.correct_phrase(current_phrase)
-                phrase_shown = True
-                detection_started = False
-                hand_detection_start_time = None
-                
-                if corrections:  
-                    synthesizer.speak_phrase(f"Ha composto: {current_phrase}")
-                    time.sleep(0.3)  # Piccola pausa tra le frasi
-                    synthesizer.speak_phrase(f"Forse intendeva: {corrected_phrase}")
-                else:
-                    synthesizer.speak_phrase(current_phrase)
-        
-        if not detection_started: #reset del timer per la detection delle mani nel caso in cui le faccio sparire dell'inquadratura
-            hand_detection_start_time = None
-        
-        if current_phrase:  # Visualizzazione frasi
-                y_offset = 170       
-                cv2.putText(image, f"Frase Composta: {current_phrase}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
-                
-                if corrected_phrase and corrected_phrase != current_phrase:
-                    cv2.putText(image, f"Frase Corretta: {corrected_phrase}", (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-                    
-                    # Mostro i candidati per ogni parola corretta
-                    for word, candidates in candidates_dict.items():
-                        if candidates:
-                            shown_candidates = candidates[:MAX_CANDIDATES_SHOWN]
-                            candidates_text = f"Candidati per '{word}': {', '.join(shown_candidates)}"
-                            
-                            if len(candidates) > MAX_CANDIDATES_SHOWN:
-                                candidates_text += f" e altri {len(candidates) - MAX_CANDIDATES_SHOWN}"
-                            
-                            cv2.putText(image, candidates_text, (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2, cv2.LINE_AA)
-                            
-                            y_offset+=30
-                            
-
-    cv2.imshow('Riconoscimento LIS MediaPipe', image)
-    
-    if cv2.waitKey(5) & 0xFF == 27:
-        break
-
-capture.release()
-cv2.destroyAllWindows()
-synthesizer.cleanup()
-#autocorrector.cleanup()
+
+            elif session.current_letter:
+                time_left = max(0, LETTER_SAVE_DELAY - (current_time - session.letter_start_time))
+                cv2.putText(image, f"Lettera: {session.current_letter} ({time_left:.1f}s)", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+                overlay.text(image, f"Lettere Salvate: {''.join(session.saved_letters)}", (10, 110), 1, (255, 255, 255))
+
+        if session.current_phrase:
+            draw_phrases(image, overlay, session, 150, 210)
+
+    elif session.current_phrase:  # Nessuna mano: frase composta, frase corretta e candidati
+        if draw_phrases(image, overlay, session, 50, 110):
+            y_offset = 170
+            for word, candidates in session.candidates_dict.items():  # Mostro i candidati per ogni parola corretta
+                if candidates:
+                    shown_candidates = candidates[:MAX_CANDIDATES_SHOWN]
+                    candidates_text = f"Candidati per '{word}': {', '.join(shown_candidates)}"
+
+                    if len(candidates) > MAX_CANDIDATES_SHOWN:
+                        candidates_text += f" e altri {len(candidates) - MAX_CANDIDATES_SHOWN}"
+
+                    overlay.text(image, candidates_text, (10, y_offset), 0.9, (255, 255, 255))
+                    y_offset += 30
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Riconoscimento dell'alfabeto LIS con MediaPipe")
+    parser.add_argument('--engine', choices=['rules', 'prototypes'], default='rules',
+                        help="motore di riconoscimento: regole geometriche o prototipo più vicino")
+    parser.add_argument('--prototypes', default='prototypes.npz',
+                        help="indice dei prototipi creato con build_prototypes.py (solo con --engine prototypes)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="processi MediaPipe in parallelo (0 = inferenza nel processo principale)")
+    parser.add_argument('--roi', action='store_true',
+                        help="dopo il primo rilevamento fa l'inferenza solo su un riquadro attorno alla mano")
+    parser.add_argument('--dynamic-hands', action='store_true',
+                        help="traccia una sola mano e cerca la seconda (gesto di reset) solo ogni 0.3 secondi")
+    parser.add_argument('--governor', action='store_true',
+                        help="riduce la frequenza di inferenza quando la mano è ferma (solo con --workers 0)")
+    parser.add_argument('--max-interval', type=float, default=0.3,
+                        help="secondi massimi tra due inferenze con la mano ferma (budget di latenza)")
+    parser.add_argument('--cpu-budget', type=float, default=None,
+                        help="frazione massima del tempo da passare in inferenza, ad esempio 0.5")
+    parser.add_argument('--record', default=None,
+                        help="salva i landmark di ogni frame in un file .lrec da riprodurre con landmark_recording.py")
+    parser.add_argument('--telemetry', action='store_true',
+                        help="mostra a schermo i tempi di ogni stadio (p50/p95/p99)")
+    parser.add_argument('--telemetry-export', default=None,
+                        help="esporta periodicamente i tempi in un file .csv o .prom (Prometheus)")
+    parser.add_argument('--telemetry-interval', type=float, default=10.0,
+                        help="secondi tra due esportazioni della telemetria")
+    parser.add_argument('--smoothing', choices=SMOOTHING_CHOICES, default='none',
+                        help="filtro temporale sui landmark prima del riconoscimento")
+    parser.add_argument('--hysteresis', type=int, default=0,
+                        help="frame consecutivi perché una lettera nuova sostituisca quella corrente (0: disattivata)")
+    parser.add_argument('--quantization-step', type=float, default=QUANTIZATION_STEP,
+                        help="passo di quantizzazione dei landmark nella cache del riconoscimento (coordinate normalizzate)")
+    parser.add_argument('--recognition-cache-size', type=int, default=RECOGNITION_CACHE_SIZE,
+                        help="voci nella cache del riconoscimento (0: disattivata)")
+    parser.add_argument('--speech-warmup', default=None,
+                        help="file di testo con una frase per riga da sintetizzare in anticipo (saluti, nomi)")
+    parser.add_argument('--speech-backend', choices=BACKEND_CHOICES, default='pyttsx3',
+                        help="motore della sintesi vocale, in un processo separato (stub: nessun audio, per i test)")
+    args = parser.parse_args()
+    startup = Startup()
+    if args.governor and args.workers > 0:
+        parser.error("--governor funziona solo con l'inferenza nel processo principale (--workers 0)")
+
+    if args.engine == 'prototypes':
+        letter_recognizer = PrototypeClassifier.load(args.prototypes)
+    else:
+        letter_recognizer = LetterRecognizer() # Prova prima l'ultima lettera riconosciuta, poi l'albero completo
+
+    # Senza opzioni la telemetria è un oggetto vuoto: le misure nel ciclo non costano nulla
+    if args.telemetry or args.telemetry_export:
+        telemetry = Telemetry(export_path=args.telemetry_export, export_interval=args.telemetry_interval)
+    else:
+        telemetry = NULL_TELEMETRY
+
+    # Le inizializzazioni lente partono subito in parallelo; l'autocorrettore serve solo alla prima frase
+    warmup_phrases = []
+    if args.speech_warmup:
+        with open(args.speech_warmup, encoding='utf-8') as file:
+            warmup_phrases = [line.strip() for line in file if line.strip()]
+    # Se la voce o il dizionario non si avviano il tracker continua senza: al loro posto un oggetto che non fa nulla
+    synthesizer = startup.background('sintesi vocale', lambda: create_synthesizer(warmup_phrases, args.speech_backend),
+                                     fallback=NullSynthesizer)
+    autocorrector = startup.background('autocorrettore', create_autocorrector, fallback=NullAutoCorrector)
+    if args.workers == 0:
+        hands = startup.background('mediapipe', lambda: create_hands(HANDS_OPTIONS, dynamic=args.dynamic_hands))
+    else:  # Hands gira nei worker, ma qui mediapipe serve per i risultati e il disegno: i worker impiegano di più ad avviarsi
+        startup.background('mediapipe', lambda: importlib.import_module('mediapipe'))
+
+    try:
+        capture = startup.measure('camera', lambda: create_capture(0, 1280, 720)) # Thread di cattura che tiene solo il frame più recente
+        overlay = TextOverlay() # Le scritte fisse vengono rasterizzate una volta sola
+
+        # Con più worker MediaPipe gira in processi separati, altrimenti in questo processo
+        if args.workers > 0:
+            roi = None
+            governor = None
+            pipeline = HandsPipeline(capture, workers=args.workers, hands_options=HANDS_OPTIONS,
+                                     roi_options={} if args.roi else None, dynamic_hands=args.dynamic_hands)
+            frames = pipeline.frames()
+        else:
+            pipeline = None
+            if not show_preview(capture, startup, [hands], overlay):
+                capture.release()
+                cv2.destroyAllWindows()
+                return
+            hands = hands.get() # Inizializzazione MediaPipe Hands, fatta in background durante l'anteprima
+            roi = RegionOfInterest() if args.roi else None
+            governor = InferenceGovernor(args.max_interval, cpu_budget=args.cpu_budget) if args.governor else None
+            frames = local_frames(capture, hands, roi=roi, governor=governor, telemetry=telemetry)
+
+        landmark_filter, label_filter = create_filters(args.smoothing, args.hysteresis)
+        session = SpellingSession(letter_recognizer, autocorrector, telemetry=telemetry,
+                                  landmark_filter=landmark_filter, label_filter=label_filter,
+                                  quantization_step=args.quantization_step,
+                                  recognition_cache_size=args.recognition_cache_size) # Tutto lo stato della composizione, senza disegno né audio
+        recorder = LandmarkRecorder(args.record) if args.record else None
+        startup_reported = False
+        pending_speech = []  # Frasi composte mentre la voce si stava avviando
+
+        for image, results, current_time in frames: # current_time è l'istante di cattura del frame, non di fine inferenza
+            if recorder is not None:
+                recorder.write_results(current_time, results)
+            events = session.step(results.multi_hand_landmarks, current_time)
+            speak_events(synthesizer, events, pending_speech)
+            if governor is not None:
+                governor.observe_letter(session.current_letter)
+
+            with telemetry.measure('draw'):
+                draw_session(image, overlay, session, results.multi_hand_landmarks, current_time)
+
+                if governor is not None:
+                    cv2.putText(image, f"Inferenza: {governor.fps():.0f} fps", (image.shape[1] - 260, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+                if args.telemetry:
+                    draw_telemetry(image, overlay, telemetry)
+
+            with telemetry.measure('display'):
+                cv2.imshow('Riconoscimento LIS MediaPipe', image)
+                key = cv2.waitKey(5) & 0xFF
+
+            telemetry.tick()
+            telemetry.maybe_export()
+            if not startup_reported and startup.done():
+                startup.mark('pronto')
+                print(startup.report())
+                startup_reported = True
+            if key == 27:
+                break
+
+        frames.close()
+        if recorder is not None:
+            recorder.close()
+            print(f"Registrati {recorder.frames_written} frame in {args.record}")
+        if pipeline is not None:
+            print(f"Pipeline: {pipeline.stats()}")
+            pipeline.close()
+        capture.release()
+        cv2.destroyAllWindows()
+        print(f"Cache del riconoscimento: {session.recognition_cache.stats()}")
+        print(f"Lettere: {session.metrics()}")
+        if isinstance(letter_recognizer, LetterRecognizer):
+            print(f"Riconoscitore: {letter_recognizer.stats()}")
+        print(f"Sintesi vocale: {synthesizer.stats()}")
+        if autocorrector.ready():
+            print(f"Cache dell'autocorrezione: {autocorrector.stats()}")
+        print(f"Frame della camera: {capture.stats()}")
+        if roi is not None:
+            print(f"Riquadro della mano: {roi.stats()}")
+        if pipeline is None and args.dynamic_hands:
+            print(f"Istanze di MediaPipe: {hands.stats()}")
+        if governor is not None:
+            print(f"Frequenza di inferenza: {governor.stats()}")
+        if telemetry is not NULL_TELEMETRY:
+            if args.telemetry_export:
+                telemetry.export()
+            for stage, values in telemetry.summary().items():
+                print(f"{stage:>12}: p50 {values['p50']:.2f} ms  p95 {values['p95']:.2f} ms  p99 {values['p99']:.2f} ms")
+        #autocorrector.cleanup()
+    finally:
+        synthesizer.cleanup()  # Anche uscendo con ESC dall'anteprima o per un errore nel ciclo
+
+
+if __name__ == '__main__':
+    main()